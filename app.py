@@ -1,22 +1,38 @@
+import base64
+import csv
+import hashlib
+import io
+import json
 import os
 import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import google.generativeai as genai
-import markdown2
-import numpy as np
+import click
 import requests
-import tensorflow as tf
 from bson.objectid import ObjectId
 from dotenv import load_dotenv
-from flask import (Flask, flash, jsonify, redirect, render_template, request,url_for)
-from flask_bcrypt import Bcrypt
+from flask import (Flask, Response, abort, flash, g, jsonify, redirect, render_template, request, stream_template, url_for)
 from flask_login import (LoginManager, UserMixin, current_user, login_required, login_user, logout_user)
 from flask_pymongo import PyMongo
-from PIL import Image
-from tensorflow.keras.models import load_model
-from werkzeug.utils import secure_filename
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from requests.adapters import HTTPAdapter
+from werkzeug.middleware.proxy_fix import ProxyFix
+from PIL import UnidentifiedImageError
 from functools import wraps
 
+from cache import MemoryCache, TieredCache
+from inference import (CLASS_NAMES, DEFAULT_MODEL_PATHS, InferenceBatcher, WarmedPredictor, image_buffer, iter_image_files,
+                       load_backend, preprocess_image)
+from llm import CircuitBreaker, LazyGeminiModel, LLMClient
+from metrics import Counter, Gauge, MongoCommandTimer, Registry, RequestProfiler
+from model_server import ModelServerClient
+from passwords import HasherBusyError, PasswordHasher, SlidingWindowLimiter
+from storage import UploadStore
+
 load_dotenv()
 
 app = Flask(__name__)
@@ -27,15 +43,52 @@ app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 app.config["SECRET_KEY"] = os.urandom(24)
 app.config["MONGO_URI"] = os.getenv("MONGO_URI")
 
+# Behind a reverse proxy, remote_addr is the proxy's address for every user; trust
+# X-Forwarded-For/-Proto from that many hops so per-client login limits see real clients
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+
+
+# METRICS (Prometheus text format at /metrics; cache and LLM figures are collected at scrape time)
+metrics_registry = Registry()
+REQUEST_SECONDS = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Request latency by route.', ['endpoint', 'method', 'status'])
+REQUESTS_IN_FLIGHT = metrics_registry.gauge('http_requests_in_flight', 'Requests currently being handled.')
+PREDICT_SECONDS = metrics_registry.histogram(
+    'predict_stage_seconds', 'predict_disease time by stage (inference includes waiting for a batch).', ['stage'])
+MODEL_FORWARD_SECONDS = metrics_registry.histogram(
+    'model_forward_seconds', 'Model forward pass per batch (in-process model only).', ['batch_size'])
+GEMINI_SECONDS = metrics_registry.histogram(
+    'gemini_call_seconds', 'Gemini call attempts by call type and outcome.', ['call_type', 'outcome'])
+OPENWEATHER_SECONDS = metrics_registry.histogram(
+    'openweather_request_seconds', 'OpenWeatherMap requests by endpoint.', ['endpoint'])
+MONGO_SECONDS = metrics_registry.histogram(
+    'mongo_command_seconds', 'MongoDB round-trips by collection and command.', ['collection', 'command'])
 
 # INITIALIZE EXTENSIONS & CUSTOM FILTERS
-mongo = PyMongo(app)
-bcrypt = Bcrypt(app)
+mongo = PyMongo(app, event_listeners=[MongoCommandTimer(MONGO_SECONDS)])
 login_manager = LoginManager(app)
 login_manager.login_view = "login"
 
+# PASSWORDS
+# bcrypt runs on a small process pool so a burst of logins can use at most
+# PASSWORD_HASH_WORKERS cores; the rest of the app keeps its CPU and threads.
+# Stored hashes made with a different BCRYPT_LOG_ROUNDS are re-hashed on the
+# next successful login. Logins are limited per client address and per email.
+password_hasher = PasswordHasher(
+    rounds=int(os.getenv("BCRYPT_LOG_ROUNDS", 12)),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", 2)),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32)),
+    queue_timeout=float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", 1)),
+)
+LOGIN_RATE_WINDOW = int(os.getenv("LOGIN_RATE_WINDOW", 300))
+login_attempts_by_ip = SlidingWindowLimiter(int(os.getenv("LOGIN_RATE_LIMIT_IP", 30)), LOGIN_RATE_WINDOW)
+login_attempts_by_email = SlidingWindowLimiter(int(os.getenv("LOGIN_RATE_LIMIT_EMAIL", 10)), LOGIN_RATE_WINDOW)
+
 @app.template_filter('markdown')
 def markdown_filter(s):
+    import markdown2
     return markdown2.markdown(s, extras=["fenced-code-blocks", "tables"])
 
 
@@ -43,12 +96,113 @@ def markdown_filter(s):
 users_collection = mongo.db.users
 diagnoses_collection = mongo.db.diagnoses
 tasks_collection = mongo.db.tasks
+prediction_cache_collection = mongo.db.prediction_cache
+suggestion_cache_collection = mongo.db.suggestion_cache
+innovations_collection = mongo.db.innovations
+innovation_claims_collection = mongo.db.innovation_claims
+stats_collection = mongo.db.stats
+upload_blobs_collection = mongo.db.upload_blobs
+
+# UPLOAD STORE
+# Uploads are stored once per distinct image under static/uploads/blobs/, named by SHA-256,
+# with a WebP thumbnail for list views. Those paths are immutable, so they get a year-long
+# cache lifetime; everything else under static/ keeps SEND_FILE_MAX_AGE_DEFAULT.
+upload_store = UploadStore(upload_blobs_collection)
+STORED_UPLOAD_MAX_AGE = 365 * 24 * 3600
+
+@app.after_request
+def cache_stored_uploads(response):
+    # Only successful responses: a cached 404 would outlive a blob that is deleted and later re-uploaded
+    if response.status_code in (200, 304) and request.endpoint == 'static' and upload_store.is_stored_path(request.view_args.get('filename', '')):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STORED_UPLOAD_MAX_AGE
+        response.cache_control.immutable = True
+        response.expires = datetime.now().astimezone() + timedelta(seconds=STORED_UPLOAD_MAX_AGE)
+    return response
+
+def release_upload(diagnosis):
+    """Drops a deleted diagnosis's reference to its image; files are removed once nothing else uses them."""
+    image_path = diagnosis.get('image_path')
+    if not image_path:
+        return
+    if upload_store.is_stored_path(image_path):
+        upload_store.release(diagnosis['image_hash'])
+        return
+    # Uploads saved before the store existed
+    filepath = os.path.join('static', image_path)
+    try:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    except Exception as e:
+        print(f"Error deleting image file {filepath}: {e}")
+
+@app.cli.command('migrate-uploads')
+def migrate_uploads_command():
+    """Moves uploads saved under their original filenames into the content-addressed store."""
+    legacy_files, migrated, missing = set(), 0, 0
+    for diagnosis in diagnoses_collection.find(
+        {'image_path': {'$not': {'$regex': f'^{upload_store.prefix}/'}}}, {'image_path': 1}
+    ):
+        filepath = os.path.join('static', diagnosis['image_path'])
+        try:
+            with open(filepath, 'rb') as f:
+                image_bytes = f.read()
+            blob = upload_store.save(image_bytes)
+        except (OSError, UnidentifiedImageError) as e:
+            click.echo(f"Skipping {diagnosis['_id']}: {e}")
+            missing += 1
+            continue
+        diagnoses_collection.update_one({'_id': diagnosis['_id']}, {'$set': {
+            'image_path': blob['image_path'],
+            'thumb_path': blob['thumb_path'],
+            'image_hash': blob['_id']
+        }})
+        legacy_files.add(filepath)
+        migrated += 1
+
+    for filepath in legacy_files:
+        os.remove(filepath)
+    click.echo(f"Migrated {migrated} diagnoses ({len(legacy_files)} files removed, {missing} skipped).")
 
 # MODEL LOADING
-MODEL_PATH = 'banana_disease_model.keras'
-model = load_model(MODEL_PATH)
-CLASS_NAMES = ['Anthracnose', 'Banana Fruit-Scarring Beetle', 'Banana Split Peel', 'Healthy Banana', 'Leaf Banana Black Sigatoka Disease', 'Leaf Banana Bract Mosaic Virus Disease', 'Leaf Banana Healthy Leaf', 'Leaf Banana Insect Pest Disease', 'Leaf Banana Moko Disease', 'Leaf Banana Natural Death', 'Leaf Banana Panama Disease', 'Leaf Banana Yellow Sigatoka Disease']
+# INFERENCE_BACKEND picks keras (default), tflite or onnx; see `python inference.py --help` to convert
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "keras")
+MODEL_PATH = os.getenv("INFERENCE_MODEL_PATH", DEFAULT_MODEL_PATHS.get(INFERENCE_BACKEND, 'banana_disease_model.keras'))
 HEALTHY_CONDITIONS = ['healthy banana', 'leaf banana healthy leaf', 'leaf banana natural death']
+# With MODEL_SERVING=shared the model lives in model_server.py and every gunicorn
+# worker sends it preprocessed arrays; otherwise each process loads its own copy.
+MODEL_SERVING = os.getenv("MODEL_SERVING", "local")
+# STARTUP_MODE=lazy (default) loads the model in a background thread so pages are served
+# straight away; /ready reports when predictions are available. eager loads it at import.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy")
+
+def build_predictor():
+    if MODEL_SERVING == 'shared':
+        return ModelServerClient()
+    return InferenceBatcher(
+        load_backend(INFERENCE_BACKEND, MODEL_PATH), CLASS_NAMES,
+        observer=lambda batch_size, seconds: MODEL_FORWARD_SECONDS.observe(seconds, batch_size=batch_size)
+    )
+
+inference_batcher = WarmedPredictor(build_predictor)
+if STARTUP_MODE == 'eager':
+    inference_batcher.load()
+else:
+    inference_batcher.start()
+
+def get_model_fingerprint(path):
+    """Changes whenever the model file is replaced, so results cached for an older model are ignored."""
+    stat = os.stat(path)
+    return f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+# PREDICTION CACHE (keyed by the SHA-256 of the uploaded image bytes)
+prediction_cache = TieredCache(
+    prediction_cache_collection,
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", 1024)),
+    ttl=int(os.getenv("PREDICTION_CACHE_TTL", 7 * 24 * 3600)),
+    version=get_model_fingerprint(MODEL_PATH),
+)
 
 # USER AUTHENTICATION
 class User(UserMixin):
@@ -59,11 +213,60 @@ class User(UserMixin):
         self.crop_location = user_data.get("crop_location", "")
         self.role = user_data.get("role", "user")
 
+# Short-lived per-process cache so authenticated XHRs don't each cost a users lookup.
+# Entries are dropped on profile/role changes made through this process; other
+# processes pick changes up once USER_CACHE_TTL has passed.
+user_cache = MemoryCache(maxsize=4096, ttl=int(os.getenv("USER_CACHE_TTL", 30)))
+
 @login_manager.user_loader
 def load_user(user_id):
-    user_data = users_collection.find_one({"_id": ObjectId(user_id)})
+    user_data = user_cache.get_or_compute(
+        user_id,
+        lambda: users_collection.find_one({"_id": ObjectId(user_id)}, {'password': 0}),
+        cacheable=lambda data: data is not None
+    )
     return User(user_data) if user_data else None
 
+# KEYSET PAGINATION
+LOGBOOK_PAGE_SIZE = int(os.getenv("LOGBOOK_PAGE_SIZE", 20))
+ADMIN_USERS_PAGE_SIZE = int(os.getenv("ADMIN_USERS_PAGE_SIZE", 50))
+
+def encode_cursor(sort_value, doc_id):
+    if isinstance(sort_value, datetime):
+        sort_value = {'$date': sort_value.isoformat()}
+    return base64.urlsafe_b64encode(json.dumps([sort_value, str(doc_id)]).encode()).decode()
+
+def decode_cursor(cursor):
+    """Turns a cursor from encode_cursor back into (sort_value, ObjectId); aborts with 400 if it is malformed."""
+    try:
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value['$date'])
+        return sort_value, ObjectId(doc_id)
+    except Exception:
+        abort(400)
+
+def fetch_page(collection, query, sort_key, descending, cursor, page_size, projection=None):
+    """Returns one page of documents ordered by (sort_key, _id) and the cursor for the next page.
+
+    Pages start strictly after the cursor's position, so the cost of a page does not
+    depend on how many pages come before it.
+    """
+    op, order = ('$lt', DESCENDING) if descending else ('$gt', ASCENDING)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        query = {'$and': [query, {'$or': [
+            {sort_key: {op: sort_value}},
+            {sort_key: sort_value, '_id': {op: last_id}}
+        ]}]}
+
+    docs = list(collection.find(query, projection).sort([(sort_key, order), ('_id', order)]).limit(page_size + 1))
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_cursor = encode_cursor(docs[-1].get(sort_key), docs[-1]['_id'])
+    return docs, next_cursor
+
 # ADMIN ROUTES
 
 def admin_required(f):
@@ -87,8 +290,25 @@ def admin_required(f):
 @admin_required
 def admin_users():
     """Renders the User Management page."""
-    all_users = list(users_collection.find().sort('name', 1))
-    return render_template('admin_dashboard.html', users=all_users)
+    users, next_cursor = fetch_admin_users_page(None)
+    return render_template('admin_dashboard.html', users=users,
+                           total_users=users_collection.estimated_document_count(),
+                           next_url=url_for('api_admin_users', cursor=next_cursor) if next_cursor else None)
+
+@app.route('/api/admin/users', endpoint='api_admin_users')
+@login_required
+@admin_required
+def api_admin_users():
+    """Next page of the user table for infinite scrolling."""
+    users, next_cursor = fetch_admin_users_page(request.args.get('cursor'))
+    return jsonify({
+        'html': render_template('admin_user_rows.html', users=users),
+        'next_url': url_for('api_admin_users', cursor=next_cursor) if next_cursor else None
+    })
+
+def fetch_admin_users_page(cursor):
+    return fetch_page(users_collection, {}, 'name', False, cursor, ADMIN_USERS_PAGE_SIZE,
+                      {'password': 0})
 
 @app.route('/admin/add_user', methods=['POST'], endpoint='admin_add_user')
 @login_required
@@ -104,7 +324,7 @@ def admin_add_user():
         user_data = {
             "name": request.form.get('name'),
             "email": email,
-            "password": bcrypt.generate_password_hash(request.form.get('password')).decode('utf-8'),
+            "password": password_hasher.hash(request.form.get('password')),
             "country": request.form.get('country'),
             "crop_location": request.form.get('crop_location'),
             "address": request.form.get('address', ''),
@@ -137,6 +357,7 @@ def admin_update_user(user_id):
             return redirect(url_for('admin_users'))
         
         users_collection.update_one({'_id': ObjectId(user_id)}, {'$set': update_data})
+        user_cache.invalidate(user_id)
         flash('User updated successfully!', 'success')
     except Exception as e:
         flash(f'An error occurred: {e}', 'error')
@@ -153,7 +374,17 @@ def admin_delete_user(user_id):
 
     try:
         users_collection.delete_one({'_id': ObjectId(user_id)})
+        user_cache.invalidate(user_id)
+        removed_stats = aggregate_diagnosis_stats({'user_id': ObjectId(user_id)})
+        stored_uploads = list(diagnoses_collection.find(
+            {'user_id': ObjectId(user_id), 'image_path': {'$regex': f'^{upload_store.prefix}/'}},
+            {'image_path': 1, 'image_hash': 1}
+        ))
         diagnoses_collection.delete_many({'user_id': ObjectId(user_id)})
+        for disease_name, counts in removed_stats.items():
+            bump_diagnosis_stats(disease_name, **{field: -count for field, count in counts.items()})
+        for diagnosis in stored_uploads:
+            release_upload(diagnosis)
         tasks_collection.delete_many({'user_id': ObjectId(user_id)})
         
         flash('User and all their associated data have been deleted.', 'success')
@@ -177,20 +408,66 @@ def admin_feedback():
 
 
 # AI & Weather API 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-gemini_model = genai.GenerativeModel('gemini-2.5-flash')
-
-def predict_disease(image_path):
-    img = Image.open(image_path).resize((256, 256))
-    img_array = tf.keras.preprocessing.image.img_to_array(img)
-    img_array = tf.expand_dims(img_array, 0)
-    predictions = model.predict(img_array)
-    score = tf.nn.softmax(predictions[0])
-    predicted_class = CLASS_NAMES[np.argmax(score)]
-    confidence = (100 * np.max(score))
-    return predicted_class, confidence
-
-def get_smart_suggestions(disease_name):
+# Every Gemini call goes through `llm`: a few concurrent calls at most, a deadline per call
+# type, jittered retries and a circuit breaker, so a slow API turns into fallback text
+# quickly instead of holding every request thread. GEMINI_API_ENDPOINT points the client
+# at another server (e.g. the fake one in benchmarks/stubs.py).
+LLM_CALL_TIMEOUTS = {
+    'suggestions': float(os.getenv("LLM_TIMEOUT_SUGGESTIONS", 60)),
+    'innovations': float(os.getenv("LLM_TIMEOUT_INNOVATIONS", 30)),
+    'weather_advice': float(os.getenv("LLM_TIMEOUT_WEATHER_ADVICE", 8)),
+    'comparison': float(os.getenv("LLM_TIMEOUT_COMPARISON", 20)),
+}
+llm = LLMClient(
+    LazyGeminiModel('gemini-2.5-flash', os.getenv("GEMINI_API_KEY"), os.getenv("GEMINI_API_ENDPOINT")),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 4)),
+    timeouts=LLM_CALL_TIMEOUTS,
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", 2)),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", 2)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", 5)),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", 30)),
+    ),
+    observer=lambda call_type, outcome, seconds: GEMINI_SECONDS.observe(seconds, call_type=call_type, outcome=outcome),
+)
+EXTERNAL_CALL_WORKERS = int(os.getenv("EXTERNAL_CALL_WORKERS", 16))
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "http://api.openweathermap.org/data/2.5")
+WEATHER_CONNECT_TIMEOUT = float(os.getenv("WEATHER_CONNECT_TIMEOUT", 3))
+WEATHER_REQUEST_TIMEOUT = float(os.getenv("WEATHER_REQUEST_TIMEOUT", 5))
+
+# Keep-alive session and per-location cache for OpenWeatherMap
+weather_session = requests.Session()
+weather_session.mount("http://", HTTPAdapter(pool_maxsize=EXTERNAL_CALL_WORKERS))
+weather_session.mount("https://", HTTPAdapter(pool_maxsize=EXTERNAL_CALL_WORKERS))
+weather_cache = MemoryCache(maxsize=256, ttl=int(os.getenv("WEATHER_CACHE_TTL", 600)))
+weather_advice_cache = MemoryCache(maxsize=1024, ttl=int(os.getenv("WEATHER_ADVICE_CACHE_TTL", 3 * 3600)))
+
+# Shared pool for outbound API calls made while rendering a page
+external_calls = ThreadPoolExecutor(max_workers=EXTERNAL_CALL_WORKERS, thread_name_prefix="external-call")
+DASHBOARD_CALL_TIMEOUT = float(os.getenv("DASHBOARD_CALL_TIMEOUT", 8))
+INNOVATIONS_PER_DAY = int(os.getenv("INNOVATIONS_PER_DAY", 4))
+INNOVATIONS_FALLBACK = {"headline": "Insights Unavailable", "summary": "AI-powered insights are currently being updated. Please check back soon."}
+WEATHER_ADVICE_FALLBACK = "Could not generate weather advice at this time."
+COMPARISON_FALLBACK = "Could not generate a comparison at this time."
+
+def predict_disease(image_source):
+    """Classifies an image path or in-memory upload; the thread's buffer is free again once predict() returns."""
+    with PREDICT_SECONDS.time(stage='preprocess'):
+        img_array = preprocess_image(image_source, out=image_buffer())
+    with PREDICT_SECONDS.time(stage='inference'):
+        return inference_batcher.predict(img_array)
+
+# SUGGESTION CACHE (one parsed Gemini answer per disease class, shared by all workers)
+SUGGESTION_PROMPT_VERSION = "v1"
+suggestion_cache = TieredCache(
+    suggestion_cache_collection,
+    maxsize=len(CLASS_NAMES),
+    ttl=int(os.getenv("SUGGESTION_CACHE_TTL", 7 * 24 * 3600)),
+    version=SUGGESTION_PROMPT_VERSION,
+    refresh_after=int(os.getenv("SUGGESTION_CACHE_REFRESH_AFTER", 24 * 3600)),
+)
+
+def get_smart_suggestions(disease_name, on_partial=None):
     if disease_name.strip().lower() in HEALTHY_CONDITIONS:
         return {
             "description": "This plant appears to be healthy.",
@@ -199,6 +476,56 @@ def get_smart_suggestions(disease_name):
             "schedule": []
         }
 
+    return suggestion_cache.get_or_compute(
+        disease_name,
+        lambda: generate_smart_suggestions(disease_name, on_partial),
+        cacheable=lambda suggestions: suggestions['description'] != "Error fetching details.",
+        refresh=lambda: generate_smart_suggestions(disease_name)
+    )
+
+def warm_suggestion_cache():
+    """Fills the suggestion cache for every disease class that is not already cached."""
+    for disease_name in CLASS_NAMES:
+        if disease_name.strip().lower() not in HEALTHY_CONDITIONS:
+            get_smart_suggestions(disease_name)
+
+SUGGESTION_SECTION_KEYS = {
+    "Description": "description",
+    "Treatment Plan": "treatment",
+    "Prevention": "prevention",
+    "Generated Treatment Schedule": "schedule"
+}
+
+def parse_schedule_rows(schedule_text):
+    schedule = []
+    rows = re.findall(r"\|\s*(.*?)\s*\|\s*(.*?)\s*\|\s*(.*?)\s*\|", schedule_text)
+    for row in rows:
+        date_text = row[0].strip().replace('**', '')
+        task_text = row[1].strip().replace('**', '')
+        details_text = row[2].strip().replace('**', '')
+
+        if "Date (Relative)" not in date_text and "---" not in date_text:
+            schedule.append({
+                "date": date_text,
+                "task": task_text,
+                "details": details_text
+            })
+    return schedule
+
+def parse_partial_suggestions(text):
+    """Parses whichever sections of a still-streaming answer have started; the last one may be incomplete."""
+    partial = {}
+    for match in re.finditer(r"### (Description|Treatment Plan|Prevention|Generated Treatment Schedule)\s*\n(.*?)(?=\n###|$)", text, re.DOTALL):
+        key = SUGGESTION_SECTION_KEYS[match.group(1)]
+        partial[key] = parse_schedule_rows(match.group(2)) if key == "schedule" else match.group(2).strip()
+    return partial
+
+def generate_smart_suggestions(disease_name, on_partial=None):
+    """Asks Gemini for advice on one disease and parses the markdown sections and schedule table.
+
+    The answer is streamed; `on_partial`, if given, is called with the sections parsed so far
+    after every chunk.
+    """
     prompt = f"""
     Act as a plant pathologist for a banana plant diagnosed with '{disease_name}'.
     Provide the following information clearly. Use markdown headings for each section.
@@ -219,28 +546,18 @@ def get_smart_suggestions(disease_name):
     Each row should represent a single, clear action. Do not use any asterisks or other markdown formatting inside the table cells.)
     """
     try:
-        response = gemini_model.generate_content(prompt)
-        text = response.text
+        text = ""
+        for chunk in llm.stream('suggestions', prompt):
+            text += chunk
+            if on_partial:
+                on_partial(parse_partial_suggestions(text))
         
         description = re.search(r"### Description\s*\n(.*?)\n### Treatment Plan", text, re.DOTALL)
         treatment = re.search(r"### Treatment Plan\s*\n(.*?)\n### Prevention", text, re.DOTALL)
         prevention = re.search(r"### Prevention\s*\n(.*?)\n### Generated Treatment Schedule", text, re.DOTALL)
         
         schedule_text = re.search(r"### Generated Treatment Schedule\s*\n(.*?)(?:\n###|$)", text, re.DOTALL)
-        schedule = []
-        if schedule_text:
-            rows = re.findall(r"\|\s*(.*?)\s*\|\s*(.*?)\s*\|\s*(.*?)\s*\|", schedule_text.group(1))
-            for row in rows:
-                date_text = row[0].strip().replace('**', '')
-                task_text = row[1].strip().replace('**', '')
-                details_text = row[2].strip().replace('**', '')
-
-                if "Date (Relative)" not in date_text and "---" not in date_text:
-                    schedule.append({
-                        "date": date_text,
-                        "task": task_text,
-                        "details": details_text
-                    })
+        schedule = parse_schedule_rows(schedule_text.group(1)) if schedule_text else []
         
         return {
             "description": description.group(1).strip() if description else "N/A",
@@ -279,26 +596,45 @@ def get_weather_forecast(location):
     if not api_key or not location:
         return None
 
+    return weather_cache.get_or_compute(
+        location.strip().lower(),
+        lambda: fetch_weather_forecast(location, api_key),
+        cacheable=lambda weather: weather is not None
+    )
+
+def fetch_openweather(endpoint, location, api_key):
+    with OPENWEATHER_SECONDS.time(endpoint=endpoint):
+        response = weather_session.get(
+            f"{OPENWEATHER_BASE_URL}/{endpoint}",
+            params={"q": location, "appid": api_key, "units": "metric"},
+            timeout=(WEATHER_CONNECT_TIMEOUT, WEATHER_REQUEST_TIMEOUT)
+        )
+    response.raise_for_status()
+    return response.json()
+
+def build_current_weather(location_name, data):
+    return {
+        "location": location_name,
+        "condition": data["weather"][0]["main"],
+        "temp": data["main"]["temp"],
+        "humidity": data["main"]["humidity"],
+        "icon": data["weather"][0]["icon"],
+        "feels_like": data["main"]["feels_like"],
+        "wind_kph": round(data["wind"]["speed"] * 3.6)
+    }
+
+def fetch_weather_forecast(location, api_key):
+    """Builds the current conditions and tomorrow's forecast, preferably from a single /forecast call."""
     try:
-        current_url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={api_key}&units=metric"
-        response_current = requests.get(current_url)
-        response_current.raise_for_status()
-        data_current = response_current.json()
-
-        current_weather = {
-            "location": data_current["name"],
-            "condition": data_current["weather"][0]["main"],
-            "temp": data_current["main"]["temp"],
-            "humidity": data_current["main"]["humidity"],
-            "icon": data_current["weather"][0]["icon"],
-            "feels_like": data_current["main"]["feels_like"],
-            "wind_kph": round(data_current["wind"]["speed"] * 3.6) 
-        }
+        data_forecast = fetch_openweather("forecast", location, api_key)
 
-        forecast_url = f"http://api.openweathermap.org/data/2.5/forecast?q={location}&appid={api_key}&units=metric"
-        response_forecast = requests.get(forecast_url)
-        response_forecast.raise_for_status()
-        data_forecast = response_forecast.json()
+        # The first forecast slot is at most 3 hours away, close enough to stand in for /weather
+        first_slot = data_forecast["list"][0] if data_forecast.get("list") else None
+        if first_slot and abs(first_slot["dt"] - time.time()) <= 3 * 3600:
+            current_weather = build_current_weather(data_forecast["city"]["name"], first_slot)
+        else:
+            data_current = fetch_openweather("weather", location, api_key)
+            current_weather = build_current_weather(data_current["name"], data_current)
 
         tomorrow_forecast_data = None
         tomorrow_date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
@@ -331,8 +667,28 @@ def get_weather_forecast(location):
         return None
 
 def get_agri_innovations():
-    prompt = """
+    """Returns the current item of the precomputed innovations feed, without calling Gemini."""
+    try:
+        item = innovations_collection.find_one(
+            {'publish_at': {'$lte': datetime.now()}},
+            sort=[('publish_at', -1)]
+        )
+    except Exception as e:
+        print(f"Error reading innovations feed: {e}")
+        item = None
+
+    if item:
+        return {"headline": item['headline'], "summary": item['summary']}
+    return INNOVATIONS_FALLBACK
+
+def generate_agri_innovation(covered_headlines=()):
+    avoid = ""
+    if covered_headlines:
+        avoid = "Do not repeat any of these stories: " + "; ".join(covered_headlines)
+
+    prompt = f"""
     Act as an agricultural journalist. Provide a single, recent innovation or news item about banana cultivation.
+    {avoid}
     Format your response with these exact markdown headings:
 
     ### Headline
@@ -342,8 +698,7 @@ def get_agri_innovations():
     (A brief, one-paragraph summary of the news.)
     """
     try:
-        response = gemini_model.generate_content(prompt)
-        text = response.text
+        text = llm.generate('innovations', prompt)
         
         headline = re.search(r"### Headline\s*\n(.*?)\n### Summary", text, re.DOTALL)
         summary = re.search(r"### Summary\s*\n(.*)", text, re.DOTALL)
@@ -354,35 +709,172 @@ def get_agri_innovations():
                 "summary": summary.group(1).strip()
             }
         else:
-            return {"headline": "Latest News", "summary": response.text}
+            return {"headline": "Latest News", "summary": text}
 
     except Exception as e:
         print(f"Gemini API Error (Innovations): {e}")
-        return {"headline": "Insights Unavailable", "summary": "AI-powered insights are currently being updated. Please check back soon."}
+        return INNOVATIONS_FALLBACK
+
+def generate_innovations_feed(day, count=None):
+    """Generates `count` feed items for `day`, spread evenly over the day by `publish_at`."""
+    count = count or INNOVATIONS_PER_DAY
+    day_start = datetime.combine(day.date() if isinstance(day, datetime) else day, datetime.min.time())
+    feed_date = day_start.strftime('%Y-%m-%d')
+    covered = []
+    stored = 0
+
+    for slot in range(count):
+        item = generate_agri_innovation(covered)
+        if item is INNOVATIONS_FALLBACK:
+            continue
+        covered.append(item['headline'])
+        innovations_collection.update_one(
+            {'feed_date': feed_date, 'slot': slot},
+            {'$set': {
+                'headline': item['headline'],
+                'summary': item['summary'],
+                'publish_at': day_start + timedelta(hours=24 * slot / count),
+                'created_at': datetime.now()
+            }},
+            upsert=True
+        )
+        stored += 1
+    return stored
+
+# Every web process may run the scheduler; a claim document per feed_date makes sure only
+# one of them calls Gemini. A claim older than INNOVATIONS_CLAIM_LEASE is taken to belong to
+# a process that died and can be taken over. A day whose generation stored nothing is
+# retried with exponential backoff instead of waiting for the next day.
+INNOVATIONS_CLAIM_LEASE = int(os.getenv("INNOVATIONS_CLAIM_LEASE", 1800))
+INNOVATIONS_RETRY_BASE = int(os.getenv("INNOVATIONS_RETRY_BASE", 300))
+INNOVATIONS_RETRY_MAX = int(os.getenv("INNOVATIONS_RETRY_MAX", 2 * 3600))
+
+def claim_innovations_feed(feed_date, owner):
+    """True if `owner` may generate `feed_date`'s feed: nobody claimed it, or their claim has lapsed."""
+    now = datetime.now()
+    try:
+        innovation_claims_collection.insert_one({'_id': feed_date, 'owner': owner, 'state': 'running', 'claimed_at': now})
+        return True
+    except DuplicateKeyError:
+        return innovation_claims_collection.update_one(
+            {'_id': feed_date, 'state': 'running', 'claimed_at': {'$lt': now - timedelta(seconds=INNOVATIONS_CLAIM_LEASE)}},
+            {'$set': {'owner': owner, 'claimed_at': now}}
+        ).modified_count == 1
+
+def run_innovations_scheduler():
+    """Background loop that fills each day's feed once, for deployments without cron."""
+    owner = f"{os.uname().nodename}:{os.getpid()}"
+    failures = 0
+    while True:
+        today = datetime.now()
+        feed_date = today.strftime('%Y-%m-%d')
+        tomorrow = datetime.combine(today.date() + timedelta(days=1), datetime.min.time())
+        wait = (tomorrow - today).total_seconds()
+        try:
+            if not innovations_collection.find_one({'feed_date': feed_date}):
+                if claim_innovations_feed(feed_date, owner):
+                    stored = generate_innovations_feed(today)
+                    if stored:
+                        failures = 0
+                        innovation_claims_collection.update_one({'_id': feed_date}, {'$set': {'state': 'done'}})
+                    else:
+                        # Hand the day back so whichever process wakes up first retries it
+                        innovation_claims_collection.delete_one({'_id': feed_date, 'owner': owner})
+                        failures += 1
+                        wait = min(wait, INNOVATIONS_RETRY_BASE * 2 ** (failures - 1), INNOVATIONS_RETRY_MAX)
+                else:
+                    # Another process is generating it; check again once its lease could have lapsed
+                    wait = min(wait, INNOVATIONS_CLAIM_LEASE)
+        except Exception as e:
+            print(f"Innovations scheduler error: {e}")
+            failures += 1
+            wait = min(wait, INNOVATIONS_RETRY_BASE * 2 ** (failures - 1), INNOVATIONS_RETRY_MAX)
+        time.sleep(max(60, wait))
+
+@app.cli.command('generate-innovations')
+@click.option('--count', type=int, default=None, help='Number of items to generate (default INNOVATIONS_PER_DAY).')
+@click.option('--date', 'feed_date', default=None, help='Feed date as YYYY-MM-DD (default today).')
+def generate_innovations_command(count, feed_date):
+    """Generates a day's agri innovations feed. Schedule daily, e.g. from cron."""
+    day = datetime.strptime(feed_date, '%Y-%m-%d') if feed_date else datetime.now()
+    stored = generate_innovations_feed(day, count)
+    click.echo(f"Stored {stored} innovation items for {day:%Y-%m-%d}.")
+
+WIND_BANDS = [(5, "calm"), (20, "light"), (40, "moderate")]
+
+def weather_advice_bucket(weather_data):
+    """Quantizes the conditions so nearby farms and repeat loads share one cached piece of advice."""
+    temp_low = int(weather_data['temp'] // 2) * 2
+    humidity_low = min(int(weather_data['humidity'] // 10) * 10, 90)
+    wind = next((label for limit, label in WIND_BANDS if weather_data['wind_kph'] < limit), "strong")
+    return (weather_data['condition'], temp_low, humidity_low, wind)
 
 def get_weather_advice(weather_data):
     if not weather_data:
         return "Weather data unavailable to generate advice."
-        
+
+    bucket = weather_advice_bucket(weather_data)
+    return weather_advice_cache.get_or_compute(
+        bucket,
+        lambda: generate_weather_advice(bucket),
+        cacheable=lambda advice: advice != WEATHER_ADVICE_FALLBACK
+    )
+
+def generate_weather_advice(bucket):
+    condition, temp_low, humidity_low, wind = bucket
     prompt = f"""
     Given the current weather for a banana farmer:
-    - Condition: {weather_data['condition']}
-    - Temperature: {weather_data['temp']}°C
-    - Humidity: {weather_data['humidity']}%
-    - Wind Speed: {weather_data['wind_kph']} kph
+    - Condition: {condition}
+    - Temperature: {temp_low}-{temp_low + 2}°C
+    - Humidity: {humidity_low}-{humidity_low + 10}%
+    - Wind: {wind}
 
     Provide a very short, one-sentence piece of actionable advice.
     Start directly with the advice. Example: High humidity increases fungal risk, so ensure good air circulation.
     """
     try:
-        response = gemini_model.generate_content(prompt)
-        return response.text.strip()
+        return llm.generate('weather_advice', prompt).strip()
     except Exception as e:
         print(f"Gemini API Error (Weather Advice): {e}")
-        return "Could not generate weather advice at this time."
+        return WEATHER_ADVICE_FALLBACK
+
+def result_within(future, deadline, default, label):
+    """Waits for `future` until `deadline` (time.monotonic()), returning `default` on timeout or error."""
+    try:
+        return future.result(timeout=max(0, deadline - time.monotonic()))
+    except TimeoutError:
+        print(f"{label} timed out")
+    except Exception as e:
+        print(f"{label} failed: {e}")
+    return default
+
+def gather_dashboard_externals(location):
+    """Fetches weather, innovations and weather advice concurrently within DASHBOARD_CALL_TIMEOUT.
+
+    Innovations run alongside the weather request; the advice call starts as soon
+    as the weather is in, since it needs the current conditions.
+    """
+    deadline = time.monotonic() + DASHBOARD_CALL_TIMEOUT
+    weather_future = external_calls.submit(get_weather_forecast, location)
+    innovations_future = external_calls.submit(get_agri_innovations)
+
+    weather = result_within(weather_future, deadline, None, "Weather forecast")
+    advice_future = external_calls.submit(get_weather_advice, weather['current'] if weather else None)
+
+    weather_advice = result_within(advice_future, deadline, WEATHER_ADVICE_FALLBACK, "Weather advice")
+    innovations = result_within(innovations_future, deadline, INNOVATIONS_FALLBACK, "Agri innovations")
+    return weather, innovations, weather_advice
 
 def get_comparison_advice(old_diagnosis, new_diagnosis):
     """Generates a comparison summary between two diagnoses."""
+    try:
+        return "".join(stream_comparison_advice(old_diagnosis, new_diagnosis)).strip()
+    except Exception as e:
+        print(f"Gemini API Error (Comparison): {e}")
+        return COMPARISON_FALLBACK
+
+def stream_comparison_advice(old_diagnosis, new_diagnosis):
+    """Yields the comparison summary chunk by chunk as Gemini generates it; raises if the call fails, even mid-stream."""
     prompt = f"""
     Act as a plant pathologist analyzing a follow-up diagnosis.
     - The original diagnosis was: '{old_diagnosis['disease_name']}' with {old_diagnosis['confidence']} confidence.
@@ -394,30 +886,503 @@ def get_comparison_advice(old_diagnosis, new_diagnosis):
     - If there is no change or it's worse, state this and suggest reviewing the treatment plan.
     Start directly with the analysis.
     """
+    yield from llm.stream('comparison', prompt)
+
+def stream_and_store_comparison(original_diagnosis, new_diagnosis):
+    """Streams a comparison into the page and stores it only if Gemini finished it."""
+    chunks = []
     try:
-        response = gemini_model.generate_content(prompt)
-        return response.text.strip()
+        for chunk in stream_comparison_advice(original_diagnosis, new_diagnosis):
+            chunks.append(chunk)
+            yield chunk
     except Exception as e:
         print(f"Gemini API Error (Comparison): {e}")
-        return "Could not generate a comparison at this time."
+        yield (" " if chunks else "") + COMPARISON_FALLBACK
+        return
+    diagnoses_collection.update_one({'_id': new_diagnosis['_id']}, {'$set': {'comparison': {
+        'original_diagnosis_id': original_diagnosis['_id'],
+        'summary': "".join(chunks).strip()
+    }}})
+
+# DIAGNOSIS PIPELINE
+# Each uploaded image is stored as a diagnosis document with a `status` that moves
+# queued -> predicting -> suggesting -> complete (or failed). The queued document is
+# the job: with DIAGNOSIS_QUEUE=local it is handed straight to an in-process pool,
+# with DIAGNOSIS_QUEUE=mongo polling workers claim it atomically. Pollers run in web
+# processes (started with their first request) and in `flask diagnosis-worker`, never
+# in other CLI commands. Jobs left behind by a process that stopped are requeued when
+# a new one starts, and failed after DIAGNOSIS_MAX_ATTEMPTS interrupted attempts.
+DIAGNOSIS_QUEUE = os.getenv("DIAGNOSIS_QUEUE", "local")
+DIAGNOSIS_WORKERS = int(os.getenv("DIAGNOSIS_WORKERS", 4))
+DIAGNOSIS_POLL_INTERVAL = float(os.getenv("DIAGNOSIS_POLL_INTERVAL", 0.5))
+DIAGNOSIS_STALE_AFTER = int(os.getenv("DIAGNOSIS_STALE_AFTER", 600))
+DIAGNOSIS_MAX_ATTEMPTS = int(os.getenv("DIAGNOSIS_MAX_ATTEMPTS", 3))
+SUGGESTION_STREAM_INTERVAL = float(os.getenv("SUGGESTION_STREAM_INTERVAL", 0.5))
+DIAGNOSIS_PENDING_STATES = ['queued', 'predicting', 'suggesting']
+PENDING_DISEASE_NAME = "Analysing..."
+DIAGNOSIS_STATUS_MESSAGES = {
+    'queued': "Waiting for the analysis to start...",
+    'predicting': "Analysing the image...",
+    'suggesting': "Preparing treatment advice...",
+    'complete': "Analysis complete.",
+    'failed': "Sorry, this image could not be analysed. Please try uploading it again."
+}
+diagnosis_jobs = ThreadPoolExecutor(max_workers=DIAGNOSIS_WORKERS, thread_name_prefix="diagnosis-job")
+
+def is_pending(diagnosis):
+    return diagnosis.get('status') in DIAGNOSIS_PENDING_STATES
+
+def claim_diagnosis_job(query):
+    """Atomically moves one queued diagnosis matching `query` to 'predicting' and returns it."""
+    return diagnoses_collection.find_one_and_update(
+        {**query, 'status': 'queued'},
+        {'$set': {'status': 'predicting', 'started_at': datetime.now()}, '$inc': {'attempts': 1}},
+        sort=[('timestamp', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def enqueue_diagnosis(diagnosis_id, image_bytes=None):
+    """With the local queue the upload bytes are handed over too, so the job doesn't read the file back from disk."""
+    if DIAGNOSIS_QUEUE == 'local':
+        diagnosis_jobs.submit(run_diagnosis_job, diagnosis_id, image_bytes)
+
+def run_diagnosis_job(diagnosis_id, image_bytes=None):
+    job = claim_diagnosis_job({'_id': diagnosis_id})
+    if job:
+        process_diagnosis(job, image_bytes)
+
+def poll_diagnosis_queue():
+    """Worker loop for DIAGNOSIS_QUEUE=mongo."""
+    while True:
+        try:
+            job = claim_diagnosis_job({})
+        except Exception as e:
+            print(f"Diagnosis queue error: {e}")
+            job = None
+
+        if job:
+            process_diagnosis(job)
+        else:
+            time.sleep(DIAGNOSIS_POLL_INTERVAL)
+
+def recover_stale_diagnoses():
+    """Requeues jobs whose process stopped mid-way, failing those that have already been tried DIAGNOSIS_MAX_ATTEMPTS times."""
+    stale = {'status': {'$in': ['predicting', 'suggesting']},
+             'started_at': {'$lt': datetime.now() - timedelta(seconds=DIAGNOSIS_STALE_AFTER)}}
+    failed = diagnoses_collection.update_many(
+        {**stale, 'attempts': {'$gte': DIAGNOSIS_MAX_ATTEMPTS}},
+        {'$set': {'status': 'failed', 'error': 'The analysis was interrupted too many times.'}}
+    ).modified_count
+    requeued = diagnoses_collection.update_many(stale, {'$set': {'status': 'queued'}}).modified_count
+    resubmitted = 0
+    if DIAGNOSIS_QUEUE == 'local':
+        # Nothing else will pick up jobs queued in a process that has gone; if that process
+        # is still running, claim_diagnosis_job makes sure only one of the two runs the job
+        for job in diagnoses_collection.find({'status': 'queued'}, {'_id': 1}).sort('timestamp', 1):
+            enqueue_diagnosis(job['_id'])
+            resubmitted += 1
+    if failed or requeued or resubmitted:
+        print(f"Diagnosis recovery: {requeued} requeued, {failed} failed, {resubmitted} resubmitted")
+
+background_workers_started = False
+background_workers_lock = threading.Lock()
+
+def start_background_workers():
+    """Recovers interrupted diagnosis jobs and starts the queue pollers and innovations scheduler, once per process."""
+    global background_workers_started
+    with background_workers_lock:
+        if background_workers_started:
+            return
+        background_workers_started = True
+
+    def recover():
+        try:
+            recover_stale_diagnoses()
+        except Exception as e:
+            print(f"Diagnosis recovery error: {e}")
+
+    threading.Thread(target=recover, name="diagnosis-recovery", daemon=True).start()
+    if DIAGNOSIS_QUEUE == 'mongo':
+        for worker in range(DIAGNOSIS_WORKERS):
+            threading.Thread(target=poll_diagnosis_queue, name=f"diagnosis-poller-{worker}", daemon=True).start()
+    if os.getenv("INNOVATIONS_SCHEDULER", "").lower() in ("1", "true", "yes"):
+        threading.Thread(target=run_innovations_scheduler, name="innovations-scheduler", daemon=True).start()
+
+@app.before_request
+def start_background_workers_on_first_request():
+    if not background_workers_started:
+        start_background_workers()
+
+@app.cli.command('diagnosis-worker')
+def diagnosis_worker_command():
+    """Processes queued diagnoses without serving web requests (DIAGNOSIS_QUEUE=mongo)."""
+    if DIAGNOSIS_QUEUE != 'mongo':
+        click.echo("diagnosis-worker needs DIAGNOSIS_QUEUE=mongo; the local queue runs inside the web processes.", err=True)
+        sys.exit(1)
+    start_background_workers()
+    click.echo(f"Processing diagnoses with {DIAGNOSIS_WORKERS} pollers.")
+    threading.Event().wait()
+
+def build_comparison(new_diagnosis):
+    """Compares a finished follow-up diagnosis with its parent; stored on the document keyed by the pair."""
+    try:
+        original = diagnoses_collection.find_one(
+            {'_id': new_diagnosis['parent_diagnosis_id']},
+            {'disease_name': 1, 'confidence': 1}
+        )
+        if not original:
+            return None
+        summary = get_comparison_advice(original, new_diagnosis)
+    except Exception as e:
+        print(f"Error building follow-up comparison: {e}")
+        return None
+
+    if summary == COMPARISON_FALLBACK:
+        return None
+    return {'original_diagnosis_id': original['_id'], 'summary': summary}
+
+def process_diagnosis(diagnosis, image_bytes=None):
+    """Runs the model and Gemini for one claimed diagnosis, saving each stage as it finishes."""
+    diagnosis_id = diagnosis['_id']
+    try:
+        cached = prediction_cache.get(diagnosis['image_hash'])
+        if cached:
+            update = {
+                'disease_name': cached['disease_name'],
+                'confidence': f"{cached['confidence']:.2f}%",
+                'suggestions': cached['suggestions'],
+                'status': 'complete'
+            }
+            if 'parent_diagnosis_id' in diagnosis:
+                update['comparison'] = build_comparison({**diagnosis, **update})
+            record_prediction(diagnosis_id, update)
+            return
+
+        if image_bytes is not None:
+            image_source = io.BytesIO(image_bytes)
+        else:
+            image_source = os.path.join('static', diagnosis['image_path'])
+        disease_name, confidence = predict_disease(image_source)
+        if not record_prediction(diagnosis_id, {
+            'disease_name': disease_name,
+            'confidence': f"{confidence:.2f}%",
+            'status': 'suggesting'
+        }):
+            return  # deleted while the model was running
+
+        # Follow-ups: write the comparison with the parent while the suggestions are generated
+        comparison_future = None
+        if 'parent_diagnosis_id' in diagnosis:
+            comparison_future = external_calls.submit(build_comparison, {
+                **diagnosis,
+                'disease_name': disease_name,
+                'confidence': f"{confidence:.2f}%"
+            })
+
+        last_saved = 0.0
+        def save_partial(partial):
+            nonlocal last_saved
+            if time.monotonic() - last_saved >= SUGGESTION_STREAM_INTERVAL:
+                last_saved = time.monotonic()
+                # Only while suggesting: a late partial must never overwrite the finished suggestions
+                diagnoses_collection.update_one({'_id': diagnosis_id, 'status': 'suggesting'},
+                                                {'$set': {'suggestions': partial}})
+
+        suggestions = get_smart_suggestions(disease_name, on_partial=save_partial)
+        if suggestions['description'] != "Error fetching details.":
+            prediction_cache.set(diagnosis['image_hash'], {
+                'disease_name': disease_name,
+                'confidence': confidence,
+                'suggestions': suggestions
+            })
+        update = {'suggestions': suggestions, 'status': 'complete'}
+        if comparison_future:
+            update['comparison'] = comparison_future.result()
+        diagnoses_collection.update_one({'_id': diagnosis_id}, {'$set': update})
+    except Exception as e:
+        print(f"Diagnosis job {diagnosis_id} failed: {e}")
+        diagnoses_collection.update_one({'_id': diagnosis_id}, {'$set': {'status': 'failed', 'error': str(e)}})
+
+# BULK DIAGNOSIS
+# `flask diagnose-batch` runs a folder or tar archive of field photos through predict_disease.
+# Decoding happens on a thread pool; because every pool thread calls predict_disease at
+# once, the InferenceBatcher (or model server) runs them through the model in batches.
+# At most 2 x --workers images are held in memory, and the output file doubles as
+# the resume log: names already in it are skipped on the next run. Inserted diagnoses
+# are upserted on (user, source, name), so images whose diagnoses were inserted just
+# before a crash (but whose rows never reached the output) aren't inserted twice.
+BULK_RESULT_FIELDS = ['name', 'disease_name', 'confidence', 'error', 'diagnosis_id']
+
+def diagnose_image_bytes(name, image_bytes):
+    try:
+        disease_name, confidence = predict_disease(io.BytesIO(image_bytes))
+    except Exception as e:
+        return {'name': name, 'error': str(e)}
+    return {'name': name, 'disease_name': disease_name, 'confidence': round(confidence, 2)}
+
+def iter_bulk_results(images, workers):
+    """Yields (result, image_bytes) in input order with at most 2 x `workers` images in flight."""
+    window = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-diagnosis") as pool:
+        for name, image_bytes in images:
+            window.append((pool.submit(diagnose_image_bytes, name, image_bytes), image_bytes))
+            if len(window) >= 2 * workers:
+                future, data = window.pop(0)
+                yield future.result(), data
+        for future, data in window:
+            yield future.result(), data
+
+def read_completed_names(output_path, output_format):
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, newline='', encoding='utf-8') as f:
+        if output_format == 'csv':
+            return {row['name'] for row in csv.DictReader(f)}
+        return {json.loads(line)['name'] for line in f if line.strip()}
+
+def build_bulk_diagnosis(result, image_bytes, user_id, plant_identifier, bulk_source):
+    blob = upload_store.save(image_bytes)
+    suggestions = suggestion_cache.get(result['disease_name']) or {}
+    return {
+        'user_id': user_id,
+        'bulk_source': bulk_source,
+        'bulk_name': result['name'],
+        'plant_identifier': plant_identifier,
+        'disease_name': result['disease_name'],
+        'confidence': f"{result['confidence']:.2f}%",
+        'suggestions': suggestions,
+        'image_path': blob['image_path'],
+        'thumb_path': blob['thumb_path'],
+        'image_hash': blob['_id'],
+        'status': 'complete',
+        'source': 'bulk',
+        'timestamp': datetime.now()
+    }
+
+@app.cli.command('diagnose-batch')
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--output', required=True, type=click.Path(), help='Results file (.csv or .jsonl).')
+@click.option('--format', 'output_format', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Output format (default: from the --output extension).')
+@click.option('--workers', type=int, default=8, help='Decode threads; also bounds the model batch size.')
+@click.option('--insert', 'insert_email', default=None, help='Also save each result as a diagnosis for this user email.')
+@click.option('--plant-identifier', default='Field survey', help='Plant name for inserted diagnoses.')
+@click.option('--flush-every', type=int, default=200, help='Rows per insert_many / output flush.')
+@click.option('--resume/--no-resume', default=True, help='Skip images already present in --output.')
+def diagnose_batch_command(source, output, output_format, workers, insert_email, plant_identifier, flush_every, resume):
+    """Diagnoses every image in a directory or tar archive."""
+    output_format = output_format or ('csv' if output.lower().endswith('.csv') else 'jsonl')
+    user_id = None
+    if insert_email:
+        user = users_collection.find_one({'email': insert_email}, {'_id': 1})
+        if not user:
+            raise click.ClickException(f"No user with email {insert_email}")
+        user_id = user['_id']
+
+    completed = read_completed_names(output, output_format) if resume else set()
+    if completed:
+        click.echo(f"Resuming: {len(completed)} images already in {output}")
+    images = ((name, data) for name, data in iter_image_files(source) if name not in completed)
+
+    write_header = output_format == 'csv' and not (resume and os.path.exists(output) and os.path.getsize(output))
+    out = open(output, 'a' if resume else 'w', newline='', encoding='utf-8')
+    writer = csv.DictWriter(out, fieldnames=BULK_RESULT_FIELDS) if output_format == 'csv' else None
+    if write_header:
+        writer.writeheader()
+
+    bulk_source = os.path.abspath(source)
+    pending_rows, pending_docs = [], []
+    processed, failed = 0, 0
+    start = time.monotonic()
+
+    def flush():
+        # Rows reach the output file only after their diagnoses are saved, so no insert is ever lost;
+        # the upsert key makes re-inserting a batch after a crash between the two a no-op
+        if pending_docs:
+            keys = [{'user_id': doc['user_id'], 'bulk_source': doc['bulk_source'], 'bulk_name': doc['bulk_name']}
+                    for _, doc in pending_docs]
+            upserted = diagnoses_collection.bulk_write(
+                [UpdateOne(key, {'$setOnInsert': doc}, upsert=True) for key, (_, doc) in zip(keys, pending_docs)],
+                ordered=True
+            ).upserted_ids
+            disease_counts = {}
+            for index, (key, (row, doc)) in enumerate(zip(keys, pending_docs)):
+                if index in upserted:
+                    row['diagnosis_id'] = str(upserted[index])
+                    disease_counts[doc['disease_name']] = disease_counts.get(doc['disease_name'], 0) + 1
+                else:
+                    # Saved by an earlier run; give back the upload reference this one took
+                    row['diagnosis_id'] = str(diagnoses_collection.find_one(key, {'_id': 1})['_id'])
+                    upload_store.release(doc['image_hash'])
+            for disease_name, count in disease_counts.items():
+                bump_diagnosis_stats(disease_name, total=count)
+            pending_docs.clear()
+        for row in pending_rows:
+            if writer:
+                writer.writerow(row)
+            else:
+                out.write(json.dumps(row) + '\n')
+        pending_rows.clear()
+        out.flush()
+
+    try:
+        for result, image_bytes in iter_bulk_results(images, workers):
+            processed += 1
+            pending_rows.append(result)
+            if 'error' in result:
+                failed += 1
+            elif user_id:
+                pending_docs.append((result, build_bulk_diagnosis(result, image_bytes, user_id, plant_identifier, bulk_source)))
+
+            if len(pending_rows) >= flush_every:
+                flush()
+                elapsed = time.monotonic() - start
+                click.echo(f"{processed} images ({processed / elapsed:.1f} images/s)")
+        flush()
+    finally:
+        out.close()
+
+    elapsed = time.monotonic() - start
+    rate = processed / elapsed if elapsed else 0.0
+    click.echo(f"Done: {processed} images in {elapsed:.1f}s ({rate:.1f} images/s), {failed} failed.")
+
+# DATABASE INDEXES
+# Every hot query must be served by one of these; `flask audit-queries` checks it with explain().
+COLLECTION_INDEXES = [
+    (users_collection, [
+        IndexModel([('email', ASCENDING)], unique=True),
+        IndexModel([('name', ASCENDING), ('_id', ASCENDING)]),
+    ]),
+    (diagnoses_collection, [
+        IndexModel([('user_id', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)]),
+        IndexModel([('reported_as_inaccurate', ASCENDING), ('timestamp', DESCENDING)]),
+        IndexModel([('confirmed_accurate', ASCENDING), ('timestamp', DESCENDING)]),
+        IndexModel([('status', ASCENDING), ('timestamp', ASCENDING)]),
+        IndexModel([('user_id', ASCENDING), ('bulk_source', ASCENDING), ('bulk_name', ASCENDING)], unique=True,
+                   partialFilterExpression={'bulk_name': {'$exists': True}}),
+    ]),
+    (tasks_collection, [
+        IndexModel([('user_id', ASCENDING), ('due_date', ASCENDING)]),
+        IndexModel([('diagnosis_id', ASCENDING)]),
+    ]),
+    (innovations_collection, [
+        IndexModel([('publish_at', DESCENDING)]),
+        IndexModel([('feed_date', ASCENDING), ('slot', ASCENDING)], unique=True),
+    ]),
+    (innovation_claims_collection, [
+        IndexModel([('claimed_at', ASCENDING)], expireAfterSeconds=7 * 24 * 3600),
+    ]),
+    (prediction_cache_collection, [
+        IndexModel([('created_at', ASCENDING)], expireAfterSeconds=prediction_cache.ttl),
+    ]),
+    (suggestion_cache_collection, [
+        IndexModel([('created_at', ASCENDING)], expireAfterSeconds=suggestion_cache.ttl),
+    ]),
+]
+
+def ensure_indexes():
+    """Creates any missing indexes; existing ones with the same spec are left alone."""
+    for collection, indexes in COLLECTION_INDEXES:
+        try:
+            collection.create_indexes(indexes)
+        except Exception as e:
+            print(f"Error creating indexes on {collection.name}: {e}")
+
+# Offline CLI paths that scan by design; reported by audit-queries but not counted as failures
+STATS_AGGREGATION_LABEL = "rebuild-stats/check-stats: full aggregation (offline)"
+EXPECTED_FULL_SCANS = {STATS_AGGREGATION_LABEL}
+
+def audited_queries():
+    """The hot queries of each route, as (label, collection name, command) for explain()."""
+    user_id, diagnosis_id = ObjectId(), ObjectId()
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    feedback_filter = {'$or': [{'reported_as_inaccurate': True}, {'confirmed_accurate': True}]}
+    return [
+        ("dashboard: recent diagnoses", 'diagnoses', {'find': 'diagnoses', 'filter': {'user_id': user_id}, 'sort': {'timestamp': -1}, 'limit': 3}),
+        ("dashboard: today's tasks", 'tasks', {'find': 'tasks', 'filter': {'user_id': user_id, 'due_date': {'$gte': today, '$lt': today + timedelta(days=1)}}, 'sort': {'due_date': 1}}),
+        ("dashboard: innovations feed", 'innovations', {'find': 'innovations', 'filter': {'publish_at': {'$lte': datetime.now()}}, 'sort': {'publish_at': -1}, 'limit': 1}),
+        ("logbook", 'diagnoses', {'find': 'diagnoses', 'filter': {'user_id': user_id}, 'sort': {'timestamp': -1, '_id': -1}, 'limit': LOGBOOK_PAGE_SIZE + 1}),
+        ("delete_diagnosis: tasks", 'tasks', {'delete': 'tasks', 'deletes': [{'q': {'diagnosis_id': diagnosis_id}, 'limit': 0}]}),
+        ("api_calendar_events", 'tasks', {'find': 'tasks', 'filter': {'user_id': user_id, 'due_date': {'$gte': today, '$lt': today + timedelta(days=42)}}}),
+        ("admin_users", 'users', {'find': 'users', 'filter': {}, 'sort': {'name': 1, '_id': 1}, 'limit': ADMIN_USERS_PAGE_SIZE + 1}),
+        ("admin_feedback", 'diagnoses', {'find': 'diagnoses', 'filter': feedback_filter, 'sort': {'timestamp': -1}}),
+        ("admin_chart_data: stats document", 'stats', {'find': 'stats', 'filter': {'_id': DIAGNOSIS_STATS_ID}, 'limit': 1}),
+        (STATS_AGGREGATION_LABEL, 'diagnoses', {'aggregate': 'diagnoses', 'pipeline': [
+            {'$match': {'disease_name': {'$ne': PENDING_DISEASE_NAME}}},
+            {'$group': {'_id': '$disease_name', 'total': {'$sum': 1}}}
+        ], 'cursor': {}}),
+        ("admin_delete_user: diagnoses", 'diagnoses', {'delete': 'diagnoses', 'deletes': [{'q': {'user_id': user_id}, 'limit': 0}]}),
+        ("login/register: user by email", 'users', {'find': 'users', 'filter': {'email': 'audit@example.com'}, 'limit': 1}),
+        ("diagnosis queue: claim", 'diagnoses', {'find': 'diagnoses', 'filter': {'status': 'queued'}, 'sort': {'timestamp': 1}, 'limit': 1}),
+        ("diagnosis queue: stale jobs", 'diagnoses', {'update': 'diagnoses', 'updates': [{'q': {'status': {'$in': ['predicting', 'suggesting']}, 'started_at': {'$lt': datetime.now()}}, 'u': {'$set': {'status': 'queued'}}, 'multi': True}]}),
+    ]
+
+def plan_has_collscan(plan):
+    """True if a COLLSCAN stage appears anywhere in an explain() result, ignoring rejected plans."""
+    if isinstance(plan, dict):
+        if plan.get('stage') == 'COLLSCAN':
+            return True
+        return any(plan_has_collscan(value) for key, value in plan.items() if key != 'rejectedPlans')
+    if isinstance(plan, list):
+        return any(plan_has_collscan(item) for item in plan)
+    return False
+
+@app.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Creates the indexes declared in COLLECTION_INDEXES."""
+    ensure_indexes()
+    click.echo("Indexes are up to date.")
+
+@app.cli.command('audit-queries')
+def audit_queries_command():
+    """Runs explain() on every route's hot query and fails if any of them needs a COLLSCAN."""
+    ensure_indexes()
+    failures = 0
+    for label, collection_name, command in audited_queries():
+        explain = mongo.db.command({'explain': command, 'verbosity': 'queryPlanner'})
+        if plan_has_collscan(explain) and label in EXPECTED_FULL_SCANS:
+            click.echo(f"scan      {label} ({collection_name})")
+        elif plan_has_collscan(explain):
+            failures += 1
+            click.echo(f"COLLSCAN  {label} ({collection_name})")
+        else:
+            click.echo(f"ok        {label} ({collection_name})")
+
+    if failures:
+        click.echo(f"{failures} queries need a collection scan.")
+        sys.exit(1)
+
+# Readiness probe: 503 until the model has loaded (STARTUP_MODE=lazy), so a load
+# balancer can hold diagnosis traffic while pages are already being served. With
+# MODEL_SERVING=shared every probe also pings the model server.
+@app.route('/ready')
+def ready():
+    inference = inference_batcher.check()
+    status_code = 200 if inference['state'] == 'ready' else 503
+    return jsonify({'ready': status_code == 200, 'inference': inference}), status_code
 
 # Signup Route
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
+        email = request.form.get('email')
+        if users_collection.find_one({'email': email}):
+            flash('Email already exists.', 'error')
+            return redirect(url_for('register'))
+        try:
+            password_hash = password_hasher.hash(request.form.get('password'))
+        except HasherBusyError:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('register.html'), 503
         user_data = {
             "name": request.form.get('name'),
-            "email": request.form.get('email'),
-            "password": bcrypt.generate_password_hash(request.form.get('password')).decode('utf-8'),
+            "email": email,
+            "password": password_hash,
             "country": request.form.get('country'),
             "address": request.form.get('address'),
             "crop_location": request.form.get('crop_location'),
             "role": "user",
         }
-        if users_collection.find_one({'email': user_data['email']}):
-            flash('Email already exists.', 'error')
-            return redirect(url_for('register'))
-        
         users_collection.insert_one(user_data)
         flash('Registration successful! Please log in.', 'success')
         return redirect(url_for('login'))
@@ -430,8 +1395,22 @@ def login():
     if request.method == 'POST':
         email = request.form.get('email')
         password = request.form.get('password')
+        # Checked before any lookup or hashing, so a flood of attempts costs next to nothing
+        if not login_attempts_by_ip.hit(request.remote_addr) or not login_attempts_by_email.hit(email):
+            flash('Too many login attempts. Please wait a few minutes and try again.', 'error')
+            return render_template('login.html'), 429
         user_data = users_collection.find_one({'email': email})
-        if user_data and bcrypt.check_password_hash(user_data['password'], password):
+        try:
+            valid = bool(user_data) and password_hasher.check(user_data['password'], password)
+        except HasherBusyError:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('login.html'), 503
+        if valid:
+            login_attempts_by_email.reset(email)
+            if password_hasher.needs_rehash(user_data['password']):
+                # Matching on the old hash keeps a password changed in the meantime from being overwritten
+                password_hasher.rehash_in_background(password, lambda new_hash: users_collection.update_one(
+                    {'_id': user_data['_id'], 'password': user_data['password']}, {'$set': {'password': new_hash}}))
             user = User(user_data)
             login_user(user)
             return redirect(url_for('dashboard'))
@@ -468,10 +1447,7 @@ def dashboard():
         'due_date': {'$gte': start_of_day, '$lt': end_of_day}
     }).sort('due_date', 1))
 
-    weather = get_weather_forecast(current_user.crop_location)
-    innovations = get_agri_innovations()
-    
-    weather_advice = get_weather_advice(weather['current'] if weather else None)
+    weather, innovations, weather_advice = gather_dashboard_externals(current_user.crop_location)
 
     return render_template('dashboard.html', 
                            diagnoses=recent_diagnoses, 
@@ -492,27 +1468,31 @@ def diagnose():
             return redirect(request.url)
         file = request.files['file']
         if file:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join('static', 'uploads', filename)
-            file.save(filepath)
-            
-            db_image_path = os.path.join('uploads', filename).replace("\\", "/")
-            disease_name, confidence = predict_disease(filepath)
-            suggestions = get_smart_suggestions(disease_name)
-            
+            image_bytes = file.stream.read()
+            image_hash = hashlib.sha256(image_bytes).hexdigest()
+            try:
+                blob = upload_store.save(image_bytes, image_hash)
+            except UnidentifiedImageError:
+                flash('That file is not an image we can read. Please upload a JPEG or PNG photo.', 'error')
+                return redirect(request.url)
+
             new_diagnosis = {
                 'user_id': ObjectId(current_user.id),
                 'plant_identifier': plant_identifier,
-                'disease_name': disease_name,
-                'confidence': f"{confidence:.2f}%",
-                'suggestions': suggestions,
-                'image_path': db_image_path,
+                'disease_name': PENDING_DISEASE_NAME,
+                'confidence': "",
+                'suggestions': {},
+                'image_path': blob['image_path'],
+                'thumb_path': blob['thumb_path'],
+                'image_hash': image_hash,
+                'status': 'queued',
                 'timestamp': datetime.now()
             }
             if parent_diagnosis_id:
                 new_diagnosis['parent_diagnosis_id'] = ObjectId(parent_diagnosis_id)
 
             result = diagnoses_collection.insert_one(new_diagnosis)
+            enqueue_diagnosis(result.inserted_id, image_bytes)
             
             if parent_diagnosis_id:
                 return redirect(url_for('follow_up_results', new_diagnosis_id=result.inserted_id))
@@ -521,26 +1501,82 @@ def diagnose():
             
     return render_template('diagnose.html')
 
+def can_view_diagnosis(diagnosis):
+    if diagnosis['user_id'] == ObjectId(current_user.id):
+        return True
+    user_role = getattr(current_user, 'role', 'user')
+    if isinstance(user_role, tuple):
+        user_role = user_role[0]
+    return user_role == 'admin'
+
 @app.route('/results/<diagnosis_id>')
 @login_required
 def results(diagnosis_id):
     diagnosis = diagnoses_collection.find_one_or_404({'_id': ObjectId(diagnosis_id)})
-    if diagnosis['user_id'] != ObjectId(current_user.id):
-        user_role = getattr(current_user, 'role', 'user')
-        if isinstance(user_role, tuple):
-            user_role = user_role[0]
-        if user_role != 'admin':
-            return "Unauthorized", 403
+    if not can_view_diagnosis(diagnosis):
+        return "Unauthorized", 403
             
-    return render_template('results.html', diagnosis=diagnosis)
+    return render_template('results.html', diagnosis=diagnosis, pending=is_pending(diagnosis),
+                           status_message=DIAGNOSIS_STATUS_MESSAGES.get(diagnosis.get('status'), ""))
+
+@app.route('/api/diagnosis_status/<diagnosis_id>')
+@login_required
+def diagnosis_status(diagnosis_id):
+    """Reports the progress of a diagnosis job for the results page to poll."""
+    diagnosis = diagnoses_collection.find_one_or_404(
+        {'_id': ObjectId(diagnosis_id)},
+        {'user_id': 1, 'status': 1, 'disease_name': 1, 'confidence': 1, 'parent_diagnosis_id': 1, 'suggestions': 1}
+    )
+    if not can_view_diagnosis(diagnosis):
+        return jsonify({'status': 'error', 'message': 'Permission denied.'}), 403
+
+    status = diagnosis.get('status', 'complete')
+    response = {'status': status, 'message': DIAGNOSIS_STATUS_MESSAGES.get(status, "")}
+    if status in ('suggesting', 'complete'):
+        response['disease_name'] = diagnosis['disease_name']
+        response['confidence'] = diagnosis['confidence']
+    if status == 'suggesting':
+        partial = diagnosis.get('suggestions', {})
+        response['sections'] = {key: markdown_filter(partial[key]) for key in ('description', 'treatment', 'prevention') if partial.get(key)}
+        response['schedule'] = partial.get('schedule', [])
+    if status == 'complete':
+        if 'parent_diagnosis_id' in diagnosis:
+            response['next_url'] = url_for('follow_up_results', new_diagnosis_id=diagnosis_id)
+        else:
+            response['next_url'] = url_for('results', diagnosis_id=diagnosis_id)
+    return jsonify(response)
 
 @app.route('/logbook')
 @login_required
 def logbook():
-    user_diagnoses = list(diagnoses_collection.find(
-        {'user_id': ObjectId(current_user.id)}
-    ).sort('timestamp', -1))
-    return render_template('logbook.html', diagnoses=user_diagnoses)
+    user_diagnoses, next_cursor = fetch_logbook_page(None)
+    return render_template('logbook.html', diagnoses=user_diagnoses,
+                           next_url=url_for('api_logbook', cursor=next_cursor) if next_cursor else None)
+
+@app.route('/api/logbook')
+@login_required
+def api_logbook():
+    """Next page of logbook entries for infinite scrolling."""
+    user_diagnoses, next_cursor = fetch_logbook_page(request.args.get('cursor'))
+    return jsonify({
+        'html': render_template('logbook_items.html', diagnoses=user_diagnoses),
+        'next_url': url_for('api_logbook', cursor=next_cursor) if next_cursor else None
+    })
+
+# Logbook cards only show the start of the AI description, so the suggestions are not loaded
+LOGBOOK_PROJECTION = {
+    'plant_identifier': 1,
+    'disease_name': 1,
+    'confidence': 1,
+    'image_path': 1,
+    'thumb_path': 1,
+    'timestamp': 1,
+    'summary': {'$substrCP': [{'$ifNull': ['$suggestions.description', '']}, 0, 200]}
+}
+
+def fetch_logbook_page(cursor):
+    return fetch_page(diagnoses_collection, {'user_id': ObjectId(current_user.id)}, 'timestamp', True,
+                      cursor, LOGBOOK_PAGE_SIZE, LOGBOOK_PROJECTION)
 
 @app.route('/delete_diagnosis/<diagnosis_id>', methods=['POST'])
 @login_required
@@ -550,16 +1586,10 @@ def delete_diagnosis(diagnosis_id):
         'user_id': ObjectId(current_user.id)
     })
 
-    if diagnosis and 'image_path' in diagnosis:
-        try:
-            filepath = os.path.join('static', diagnosis['image_path'])
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        except Exception as e:
-            print(f"Error deleting image file {filepath}: {e}")
-    
     tasks_collection.delete_many({'diagnosis_id': ObjectId(diagnosis_id)})
-    diagnoses_collection.delete_one({'_id': ObjectId(diagnosis_id)})
+    if diagnoses_collection.delete_one({'_id': ObjectId(diagnosis_id)}).deleted_count:
+        forget_diagnosis_stats(diagnosis)
+        release_upload(diagnosis)
     
     flash('Logbook entry and all associated tasks have been deleted.', 'success')
     return redirect(url_for('logbook'))
@@ -585,7 +1615,12 @@ def account():
 
         if new_password:
             if new_password == confirm_password:
-                update_data['password'] = bcrypt.generate_password_hash(new_password).decode('utf-8')
+                try:
+                    update_data['password'] = password_hasher.hash(new_password)
+                except HasherBusyError:
+                    flash('The server is busy. Please try again in a moment.', 'error')
+                    user_data = users_collection.find_one({'_id': ObjectId(current_user.id)})
+                    return render_template('account.html', user=user_data), 503
             else:
                 flash('New passwords do not match. Please try again.', 'error')
                 user_data = users_collection.find_one({'_id': ObjectId(current_user.id)})
@@ -595,6 +1630,7 @@ def account():
             {'_id': ObjectId(current_user.id)},
             {'$set': update_data}
         )
+        user_cache.invalidate(current_user.id)
         
         flash('Your account has been updated successfully!', 'success')
         return redirect(url_for('account'))
@@ -629,7 +1665,20 @@ def delete_task(task_id):
 @app.route('/api/calendar_events')
 @login_required
 def api_calendar_events():
-    user_tasks = tasks_collection.find({'user_id': ObjectId(current_user.id)})
+    """Tasks for the range FullCalendar is showing (its `start`/`end` query parameters)."""
+    query = {'user_id': ObjectId(current_user.id)}
+    try:
+        due_range = {}
+        if request.args.get('start'):
+            due_range['$gte'] = parse_calendar_bound(request.args['start'])
+        if request.args.get('end'):
+            due_range['$lt'] = parse_calendar_bound(request.args['end'])
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Invalid start or end date.'}), 400
+    if due_range:
+        query['due_date'] = due_range
+
+    user_tasks = tasks_collection.find(query, {'description': 1, 'due_date': 1, 'is_all_day': 1})
     events = []
     for task in user_tasks:
         events.append({
@@ -638,7 +1687,16 @@ def api_calendar_events():
             'start': task['due_date'].isoformat(),
             'allDay': task.get('is_all_day', False)
         })
-    return jsonify(events)
+
+    # Unchanged months are answered with 304 Not Modified
+    response = jsonify(events)
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+def parse_calendar_bound(value):
+    """FullCalendar sends ISO 8601 dates, sometimes with an offset; due dates are stored as naive local times."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
 
 @app.route('/api/add_schedule_to_calendar', methods=['POST'])
 @login_required
@@ -716,16 +1774,20 @@ def schedule_follow_up(diagnosis_id):
 @login_required
 def confirm_diagnosis(diagnosis_id):
     """API endpoint for a user to confirm an accurate diagnosis."""
-    result = diagnoses_collection.update_one(
+    previous = diagnoses_collection.find_one_and_update(
         {'_id': ObjectId(diagnosis_id), 'user_id': ObjectId(current_user.id)},
         {'$set': {
             'confirmed_accurate': True,
             'reported_as_inaccurate': False, # Ensure it's not marked as inaccurate
             'confirm_timestamp': datetime.now()
-        }}
+        }},
+        projection=STATS_PROJECTION
     )
     
-    if result.matched_count == 1:
+    if previous:
+        bump_diagnosis_stats(previous['disease_name'],
+                             confirmed=0 if previous.get('confirmed_accurate') else 1,
+                             reported=-1 if previous.get('reported_as_inaccurate') else 0)
         return jsonify({'status': 'success', 'message': 'Thank you for your feedback!'})
     else:
         return jsonify({'status': 'error', 'message': 'Diagnosis not found or permission denied.'}), 404
@@ -740,41 +1802,139 @@ def report_diagnosis(diagnosis_id):
     if not reason:
         return jsonify({'status': 'error', 'message': 'A reason is required to submit a report.'}), 400
         
-    result = diagnoses_collection.update_one(
+    previous = diagnoses_collection.find_one_and_update(
         {'_id': ObjectId(diagnosis_id), 'user_id': ObjectId(current_user.id)},
         {'$set': {
             'reported_as_inaccurate': True,
             'confirmed_accurate': False, # Ensure it's not marked as accurate
             'report_reason': reason,
             'report_timestamp': datetime.now()
-        }}
+        }},
+        projection=STATS_PROJECTION
     )
     
-    if result.matched_count == 1:
+    if previous:
+        bump_diagnosis_stats(previous['disease_name'],
+                             confirmed=-1 if previous.get('confirmed_accurate') else 0,
+                             reported=0 if previous.get('reported_as_inaccurate') else 1)
         return jsonify({'status': 'success', 'message': 'Report submitted successfully. An admin will review this.'})
     else:
         return jsonify({'status': 'error', 'message': 'Diagnosis not found or permission denied.'}), 404
 
+# DIAGNOSIS STATISTICS
+# Per-disease totals and feedback counts, kept in one document and updated with $inc
+# whenever a diagnosis gets its prediction, is confirmed/reported or is deleted.
+# The document is only ever created by a full rebuild (on the first read, or by
+# `flask rebuild-stats`); until then the increments are skipped, since a document
+# started from them would be missing everything recorded before it.
+DIAGNOSIS_STATS_ID = 'diagnoses'
+STATS_PROJECTION = {'disease_name': 1, 'confirmed_accurate': 1, 'reported_as_inaccurate': 1}
+
+def bump_diagnosis_stats(disease_name, total=0, confirmed=0, reported=0):
+    if disease_name == PENDING_DISEASE_NAME:
+        return
+    inc = {f'diseases.{disease_name}.{field}': delta
+           for field, delta in (('total', total), ('confirmed', confirmed), ('reported', reported)) if delta}
+    if not inc:
+        return
+    try:
+        stats_collection.update_one({'_id': DIAGNOSIS_STATS_ID}, {'$inc': inc})
+    except Exception as e:
+        print(f"Error updating diagnosis stats: {e}")
+
+def record_prediction(diagnosis_id, update):
+    """Saves a diagnosis's prediction and counts it in the stats, returning False if the diagnosis is gone.
+
+    The flags are read from the same atomic update, so feedback given while the
+    diagnosis was still pending (and skipped by bump_diagnosis_stats) is counted
+    now; a job that is re-run after its prediction landed isn't counted twice.
+    """
+    previous = diagnoses_collection.find_one_and_update({'_id': diagnosis_id}, {'$set': update},
+                                                        projection=STATS_PROJECTION)
+    if previous is None:
+        return False
+    if previous.get('disease_name') == PENDING_DISEASE_NAME:
+        bump_diagnosis_stats(update['disease_name'], total=1,
+                             confirmed=1 if previous.get('confirmed_accurate') else 0,
+                             reported=1 if previous.get('reported_as_inaccurate') else 0)
+    return True
+
+def forget_diagnosis_stats(diagnosis):
+    """Removes a diagnosis that is about to be deleted from the stats."""
+    bump_diagnosis_stats(diagnosis['disease_name'], total=-1,
+                         confirmed=-1 if diagnosis.get('confirmed_accurate') else 0,
+                         reported=-1 if diagnosis.get('reported_as_inaccurate') else 0)
+
+def aggregate_diagnosis_stats(match=None):
+    """Computes the per-disease stats from scratch with a full aggregation."""
+    pipeline = [
+        {'$match': {**(match or {}), 'disease_name': {'$ne': PENDING_DISEASE_NAME}}},
+        {'$group': {
+            '_id': '$disease_name',
+            'total': {'$sum': 1},
+            'confirmed': {'$sum': {'$cond': [{'$eq': ['$confirmed_accurate', True]}, 1, 0]}},
+            'reported': {'$sum': {'$cond': [{'$eq': ['$reported_as_inaccurate', True]}, 1, 0]}}
+        }}
+    ]
+    return {d['_id']: {'total': d['total'], 'confirmed': d['confirmed'], 'reported': d['reported']}
+            for d in diagnoses_collection.aggregate(pipeline)}
+
+def rebuild_diagnosis_stats():
+    diseases = aggregate_diagnosis_stats()
+    stats_collection.replace_one({'_id': DIAGNOSIS_STATS_ID}, {'diseases': diseases}, upsert=True)
+    return diseases
+
+def load_diagnosis_stats():
+    stats = stats_collection.find_one({'_id': DIAGNOSIS_STATS_ID})
+    if stats is None:
+        return rebuild_diagnosis_stats()
+    # Drop diseases whose counts have all gone back to zero
+    return {name: counts for name, counts in stats.get('diseases', {}).items() if any(counts.values())}
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recomputes the admin diagnosis statistics from the diagnoses collection."""
+    diseases = rebuild_diagnosis_stats()
+    click.echo(f"Rebuilt stats for {len(diseases)} diseases.")
+
+@app.cli.command('check-stats')
+def check_stats_command():
+    """Compares the incrementally maintained stats with a full aggregation; exits non-zero if they differ."""
+    incremental = load_diagnosis_stats()
+    full = aggregate_diagnosis_stats()
+    mismatches = 0
+    for name in sorted(set(incremental) | set(full)):
+        expected = full.get(name, {'total': 0, 'confirmed': 0, 'reported': 0})
+        actual = {field: incremental.get(name, {}).get(field, 0) for field in expected}
+        if actual != expected:
+            mismatches += 1
+            click.echo(f"{name}: stored {actual}, actual {expected}")
+
+    if mismatches:
+        click.echo(f"{mismatches} diseases are out of sync; run `flask rebuild-stats`.")
+        sys.exit(1)
+    click.echo("Diagnosis stats are consistent.")
+
 # ADMIN CHART DATA API
 @app.route('/api/admin/chart_data', endpoint='admin_chart_data')
 @login_required
 @admin_required
 def admin_chart_data():
     try:
+        diseases = load_diagnosis_stats()
+
         # Feedback Pie Chart 
-        confirmed_count = diagnoses_collection.count_documents({'confirmed_accurate': True})
-        reported_count = diagnoses_collection.count_documents({'reported_as_inaccurate': True})
+        confirmed_count = sum(counts.get('confirmed', 0) for counts in diseases.values())
+        reported_count = sum(counts.get('reported', 0) for counts in diseases.values())
         
         # Inaccuracy Bar Chart 
-        pipeline = [
-            {"$match": {"reported_as_inaccurate": True}},
-            {"$group": {"_id": "$disease_name", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]
-        inaccurate_data = list(diagnoses_collection.aggregate(pipeline))
+        inaccurate_data = sorted(
+            ((name, counts.get('reported', 0)) for name, counts in diseases.items() if counts.get('reported', 0) > 0),
+            key=lambda item: item[1], reverse=True
+        )
         
-        bar_labels = [d['_id'] for d in inaccurate_data]
-        bar_counts = [d['count'] for d in inaccurate_data]
+        bar_labels = [name for name, count in inaccurate_data]
+        bar_counts = [count for name, count in inaccurate_data]
 
         return jsonify({
             'pieData': {
@@ -790,6 +1950,128 @@ def admin_chart_data():
         print(f"Error fetching chart data: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/admin/cache_stats', endpoint='admin_cache_stats')
+@login_required
+@admin_required
+def admin_cache_stats():
+    """Hit/miss counters for the in-process caches."""
+    weather_advice_stats = weather_advice_cache.snapshot()
+    weather_advice_stats['distinct_buckets'] = weather_advice_stats.pop('size')
+    return jsonify({
+        'prediction_cache': prediction_cache.snapshot(),
+        'suggestion_cache': suggestion_cache.snapshot(),
+        'weather_cache': weather_cache.snapshot(),
+        'weather_advice_cache': weather_advice_stats,
+        'user_cache': user_cache.snapshot()
+    })
+
+# REQUEST METRICS & PROFILING
+# An admin can profile a single request by sending `X-Profile: cprofile` (or `stacks` for
+# flame-graph-ready collapsed stacks), or profile the next N requests in this process
+# through /api/admin/profiling. Profiles are written to PROFILE_DIR.
+request_profiler = RequestProfiler(os.getenv("PROFILE_DIR", "profiles"))
+profiling_toggle = {'mode': None, 'remaining': 0}
+profiling_toggle_lock = threading.Lock()
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+def requested_profile_mode():
+    mode = request.headers.get('X-Profile')
+    if mode in RequestProfiler.MODES and current_user.is_authenticated and current_user.role == 'admin':
+        return mode
+    with profiling_toggle_lock:
+        if profiling_toggle['remaining'] > 0 and request.endpoint not in ('metrics', 'static'):
+            profiling_toggle['remaining'] -= 1
+            return profiling_toggle['mode']
+    return None
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    mode = requested_profile_mode()
+    g.profile_session = request_profiler.start(mode) if mode else None
+
+@app.after_request
+def finish_request_profile(response):
+    g.response_status = response.status_code
+    session = g.pop('profile_session', None)
+    if session:
+        path = request_profiler.finish(session, request.endpoint or 'unmatched')
+        response.headers['X-Profile-Output'] = os.path.basename(path)
+    return response
+
+@app.teardown_request
+def record_request_metrics(exc):
+    if 'request_start' not in g:
+        return
+    REQUESTS_IN_FLIGHT.dec()
+    session = g.pop('profile_session', None)
+    if session:
+        request_profiler.finish(session, request.endpoint or 'unmatched')
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=request.endpoint or 'unmatched',
+                            method=request.method, status=g.get('response_status', 500))
+
+@metrics_registry.collector
+def collect_cache_metrics():
+    hits = Counter('cache_hits_total', 'Cache hits.', ['cache'])
+    misses = Counter('cache_misses_total', 'Cache misses.', ['cache'])
+    hit_ratio = Gauge('cache_hit_ratio', 'Cache hit rate since start.', ['cache'])
+    entries = Gauge('cache_entries', 'Entries in the in-memory tier.', ['cache'])
+    for name, cache in (('prediction', prediction_cache), ('suggestion', suggestion_cache), ('weather', weather_cache),
+                        ('weather_advice', weather_advice_cache), ('user', user_cache)):
+        stats = cache.snapshot()
+        hits.inc(stats['hits'], cache=name)
+        misses.inc(stats['misses'], cache=name)
+        hit_ratio.set(stats['hit_rate'], cache=name)
+        entries.set(stats['size'], cache=name)
+    return [hits, misses, hit_ratio, entries]
+
+@metrics_registry.collector
+def collect_llm_metrics():
+    snapshot = llm.snapshot()
+    calls = Counter('gemini_calls_total', 'Gemini call attempts by result (ok, errors, timeouts, retries, rejected).',
+                    ['call_type', 'result'])
+    for call_type, stats in snapshot['calls'].items():
+        for result in ('ok', 'errors', 'timeouts', 'retries', 'rejected'):
+            calls.inc(stats[result], call_type=call_type, result=result)
+    in_flight = Gauge('gemini_calls_in_flight', 'Gemini calls currently running.')
+    in_flight.set(snapshot['in_flight'])
+    circuit_open = Gauge('gemini_circuit_open', '1 while the Gemini circuit breaker is open or half-open.')
+    circuit_open.set(int(snapshot['circuit']['state'] != 'closed'))
+    model_ready = Gauge('model_ready', '1 once the model has loaded.')
+    model_ready.set(int(inference_batcher.status()['state'] == 'ready'))
+    return [calls, in_flight, circuit_open, model_ready]
+
+@app.route('/metrics')
+def metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        abort(401)
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/profiling', methods=['GET', 'POST'], endpoint='admin_profiling')
+@login_required
+@admin_required
+def admin_profiling():
+    """POST {"mode": "cprofile" | "stacks" | null, "requests": N} profiles the next N requests handled by this process."""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode')
+        if mode is not None and mode not in RequestProfiler.MODES:
+            return jsonify({'error': f"mode must be one of {', '.join(RequestProfiler.MODES)} or null"}), 400
+        with profiling_toggle_lock:
+            profiling_toggle['mode'] = mode
+            profiling_toggle['remaining'] = int(data.get('requests', 1)) if mode else 0
+    with profiling_toggle_lock:
+        state = dict(profiling_toggle)
+    return jsonify({**state, 'directory': request_profiler.directory})
+
+@app.route('/api/admin/llm_stats', endpoint='admin_llm_stats')
+@login_required
+@admin_required
+def admin_llm_stats():
+    """Circuit state, in-flight calls and per-call-type latency/error counters for Gemini."""
+    return jsonify(llm.snapshot())
+
 
 # FOLLOW-UP ROUTES
 @app.route('/follow_up/<original_diagnosis_id>')
@@ -803,22 +2085,57 @@ def follow_up_diagnose(original_diagnosis_id):
 @login_required
 def follow_up_results(new_diagnosis_id):
     """Displays the comparison between the original and new diagnosis."""
-    new_diagnosis = diagnoses_collection.find_one_or_404({'_id': ObjectId(new_diagnosis_id)})
+    # One round-trip for the follow-up and its parent
+    found = list(diagnoses_collection.aggregate([
+        {'$match': {'_id': ObjectId(new_diagnosis_id)}},
+        {'$lookup': {
+            'from': diagnoses_collection.name,
+            'localField': 'parent_diagnosis_id',
+            'foreignField': '_id',
+            'as': 'parent'
+        }}
+    ]))
+    if not found:
+        abort(404)
+    new_diagnosis = found[0]
     
     if 'parent_diagnosis_id' not in new_diagnosis:
         return "Error: This is not a follow-up diagnosis.", 404
+
+    if is_pending(new_diagnosis) or new_diagnosis.get('status') == 'failed':
+        return render_template('results.html', diagnosis=new_diagnosis, pending=is_pending(new_diagnosis),
+                               status_message=DIAGNOSIS_STATUS_MESSAGES[new_diagnosis['status']])
         
-    original_diagnosis = diagnoses_collection.find_one_or_404({'_id': new_diagnosis['parent_diagnosis_id']})
-    
-    comparison_summary = get_comparison_advice(original_diagnosis, new_diagnosis)
-    
-    return render_template('follow_up_results.html', 
-                           original=original_diagnosis, 
-                           new=new_diagnosis, 
-                           summary=comparison_summary)
+    if not new_diagnosis['parent']:
+        abort(404)
+    original_diagnosis = new_diagnosis.pop('parent')[0]
+
+    comparison = new_diagnosis.get('comparison')
+    if comparison and comparison.get('original_diagnosis_id') == original_diagnosis['_id']:
+        return render_template('follow_up_results.html',
+                               original=original_diagnosis,
+                               new=new_diagnosis,
+                               summary=[comparison['summary']])
+
+    # Diagnoses made before comparisons were stored: stream the page so everything above
+    # the summary renders while Gemini is still writing it, and keep the finished summary
+    return stream_template('follow_up_results.html',
+                           original=original_diagnosis,
+                           new=new_diagnosis,
+                           summary=stream_and_store_comparison(original_diagnosis, new_diagnosis))
+
+if os.getenv("ENSURE_INDEXES", "1").lower() in ("1", "true", "yes"):
+    threading.Thread(target=ensure_indexes, name="ensure-indexes", daemon=True).start()
+
+if os.getenv("WARM_SUGGESTION_CACHE", "").lower() in ("1", "true", "yes"):
+    threading.Thread(target=warm_suggestion_cache, name="suggestion-cache-warmup", daemon=True).start()
 
 if __name__ == '__main__':
     if not os.path.exists('static/uploads'):
         os.makedirs('static/uploads')
 
+    # Spawned pool processes re-import the main module, which here is this whole app
+    # (model, Mongo, background threads), so the dev server hashes inline unless asked
+    password_hasher.workers = int(os.getenv("PASSWORD_HASH_WORKERS", 0))
+
     app.run(debug=True)
@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Benchmarks are run from the repo root or from this folder; make the app modules importable either way.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def import_app(**env):
+    """Imports app.py with local defaults for the settings it reads at import time."""
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/plant_care_bench")
+    os.environ.setdefault("GEMINI_API_KEY", "bench")
+    for key, value in env.items():
+        os.environ[key] = str(value)
+    import app
+    return app
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_concurrent(fn, concurrency, total_calls):
+    """Calls `fn()` `total_calls` times from `concurrency` threads and summarises the latencies."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed_call(_):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            with lock:
+                errors += 1
+        finally:
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed_call, range(total_calls)))
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "concurrency": concurrency,
+        "calls": total_calls,
+        "errors": errors,
+        "throughput_rps": round(total_calls / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def print_results(title, rows):
+    """Prints one JSON line per result row under a heading."""
+    print(f"# {title}")
+    for row in rows:
+        print(json.dumps(row))
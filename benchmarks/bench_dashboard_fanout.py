@@ -0,0 +1,50 @@
+"""Dashboard external-call latency: sequential calls vs. gather_dashboard_externals().
+
+Runs against a local OpenWeatherMap stub and a fake Gemini model, each with
+configurable latency. The sequential baseline still generates the innovations
+item with Gemini, as the dashboard used to; the fan-out reads the feed from
+the Mongo database at MONGO_URI.
+
+Usage: python benchmarks/bench_dashboard_fanout.py [--weather-latency 0.3] [--llm-latency 1.0]
+"""
+import argparse
+import itertools
+
+from _util import import_app, print_results, run_concurrent
+from stubs import FakeGeminiModel, StubWeatherServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--weather-latency", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--calls", type=int, default=16)
+    args = parser.parse_args()
+
+    with StubWeatherServer(latency=args.weather_latency) as weather_server:
+        app = import_app(WEATHER_API_KEY="bench")
+        app.OPENWEATHER_BASE_URL = weather_server.base_url
+        app.llm.model = FakeGeminiModel(latency=args.llm_latency)
+
+        # A fresh location per call keeps the weather cache from hiding the round-trips being measured
+        call_ids = itertools.count()
+
+        def sequential():
+            weather = app.get_weather_forecast(f"Kandy-{next(call_ids)}")
+            app.generate_agri_innovation()
+            app.get_weather_advice(weather['current'] if weather else None)
+
+        def concurrent():
+            app.gather_dashboard_externals(f"Kandy-{next(call_ids)}")
+
+        rows = []
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            rows.append({"mode": "sequential", **run_concurrent(sequential, concurrency, args.calls)})
+            rows.append({"mode": "fan-out", **run_concurrent(concurrent, concurrency, args.calls)})
+
+    print_results(f"dashboard externals (weather={args.weather_latency}s, llm={args.llm_latency}s)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Load time, peak RSS and single-image latency for each inference backend.
+
+Every backend runs in its own subprocess so its RSS is measured in isolation
+(TensorFlow alone is several hundred MB). Convert the model first with
+`python inference.py convert`.
+
+Usage: python benchmarks/bench_inference_backends.py [--backend keras=banana_disease_model.keras --backend tflite=banana_disease_model.tflite]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from _util import REPO_ROOT, percentile, print_results
+
+
+def measure(backend, model_path, calls):
+    from inference import load_backend
+
+    start = time.perf_counter()
+    model = load_backend(backend, model_path)
+    load_seconds = time.perf_counter() - start
+
+    batch = np.random.default_rng(0).uniform(0, 255, (1, 256, 256, 3)).astype("float32")
+    model.predict_on_batch(batch)  # first call allocates tensors / traces the graph
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        model.predict_on_batch(batch)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "backend": backend,
+        "model": model_path,
+        "load_s": round(load_seconds, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", action="append", help="name=model_path; repeatable.")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        backend, model_path = args.child.split("=", 1)
+        print(json.dumps(measure(backend, model_path, args.calls)))
+        return
+
+    specs = args.backend or ["keras=banana_disease_model.keras", "tflite=banana_disease_model.tflite"]
+    rows = []
+    for spec in specs:
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", spec, "--calls", str(args.calls)],
+            cwd=REPO_ROOT, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            rows.append({"backend": spec, "error": result.stderr.strip().splitlines()[-1:]})
+            continue
+        rows.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print_results("inference backends (batch of 1)", rows)
+
+
+if __name__ == "__main__":
+    main()
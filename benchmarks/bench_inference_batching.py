@@ -0,0 +1,49 @@
+"""Throughput and latency of predict_disease-style inference, unbatched vs. InferenceBatcher.
+
+Usage: python benchmarks/bench_inference_batching.py [--model banana_disease_model.keras]
+"""
+import argparse
+
+import numpy as np
+
+from _util import print_results, run_concurrent
+from inference import InferenceBatcher, softmax
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="banana_disease_model.keras")
+    parser.add_argument("--concurrency", default="1,2,4,8,16")
+    parser.add_argument("--calls", type=int, default=256)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+    model = load_model(args.model)
+    class_names = [str(i) for i in range(model.output_shape[-1])]
+    img = np.random.default_rng(0).uniform(0, 255, (256, 256, 3)).astype("float32")
+
+    def unbatched():
+        predictions = model.predict(np.expand_dims(img, 0), verbose=0)
+        score = softmax(predictions)[0]
+        return class_names[int(np.argmax(score))], float(100 * np.max(score))
+
+    batcher = InferenceBatcher(model, class_names, args.max_batch_size, args.max_wait_ms)
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    # Warm up both paths so graph tracing is not counted.
+    unbatched()
+    batcher.predict(img)
+
+    rows = []
+    for concurrency in levels:
+        rows.append({"mode": "unbatched", **run_concurrent(unbatched, concurrency, args.calls)})
+        rows.append({"mode": "batched", **run_concurrent(lambda: batcher.predict(img), concurrency, args.calls)})
+    batcher.close()
+
+    print_results(f"inference batching (max_batch_size={args.max_batch_size}, max_wait_ms={args.max_wait_ms})", rows)
+
+
+if __name__ == "__main__":
+    main()
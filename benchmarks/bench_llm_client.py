@@ -0,0 +1,65 @@
+"""How the Gemini client layer behaves when the API is healthy, flaky, slow or down.
+
+Starts the local fake Gemini server (benchmarks/stubs.py), points the app at
+it with GEMINI_API_ENDPOINT and drives weather-advice, innovations and
+suggestion calls from many threads. Each scenario reports caller-side
+latency, how many callers got the fallback text, and the client's own
+per-call-type metrics and circuit state.
+
+Usage: python benchmarks/bench_llm_client.py [--concurrency 16] [--calls 64]
+"""
+import argparse
+import itertools
+
+from _util import import_app, print_results, run_concurrent
+from stubs import StubGeminiServer
+
+SCENARIOS = [
+    # (name, latency seconds, failure rate)
+    ("healthy", 0.2, 0.0),
+    ("flaky", 0.2, 0.3),
+    ("slow", 15.0, 0.0),
+    ("down", 0.05, 1.0),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=64)
+    args = parser.parse_args()
+
+    with StubGeminiServer() as server:
+        app = import_app(GEMINI_API_ENDPOINT=server.base_url)
+        model = app.llm.model
+        rows, snapshots = [], []
+        for name, latency, failure_rate in SCENARIOS:
+            server.latency, server.failure_rate = latency, failure_rate
+            # Fresh client per scenario so metrics and breaker state don't carry over
+            app.llm = app.LLMClient(model, max_concurrency=app.llm.max_concurrency, timeouts=app.LLM_CALL_TIMEOUTS,
+                                    queue_timeout=app.llm.queue_timeout, max_retries=app.llm.max_retries,
+                                    breaker=app.CircuitBreaker(app.llm.breaker.failure_threshold,
+                                                               app.llm.breaker.reset_timeout))
+            fallbacks = itertools.count()
+
+            def call():
+                # The uncached generators, so every call reaches the client
+                advice = app.generate_weather_advice(("Clouds", 26, 70, "calm"))
+                if advice == app.WEATHER_ADVICE_FALLBACK:
+                    next(fallbacks)
+                if app.generate_agri_innovation() is app.INNOVATIONS_FALLBACK:
+                    next(fallbacks)
+                if app.generate_smart_suggestions("Anthracnose")["description"] == "Error fetching details.":
+                    next(fallbacks)
+
+            stats = run_concurrent(call, args.concurrency, args.calls)
+            rows.append({"scenario": name, "latency_s": latency, "failure_rate": failure_rate,
+                         "fallbacks": next(fallbacks), "llm_calls": args.calls * 3, **stats})
+            snapshots.append({"scenario": name, **app.llm.snapshot()})
+
+    print_results("LLM client, caller view (3 LLM calls per row call)", rows)
+    print_results("LLM client metrics", snapshots)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Login throughput under concurrent load, with bcrypt inline vs. on the password process pool.
+
+Each row floods POST /login from `concurrency` threads (real password
+checks at BCRYPT_LOG_ROUNDS) while one more thread keeps requesting a cheap
+route (`--bystander`, /ready by default), so the table shows both login
+throughput and how much the flood slows the rest of the app. The "limited"
+rows replay the flood against a single email with the wrong password and the
+app's default rate limits, where most attempts should get a 429 before any
+hashing.
+
+Needs a mongod at MONGO_URI (defaults to a local `plant_care_bench`
+database); a throwaway user is created and removed.
+
+Usage: python benchmarks/bench_login.py [--concurrency 1,4,16] [--calls 200] [--rounds 12] [--workers 2]
+"""
+import argparse
+import os
+import threading
+import time
+
+from _util import import_app, percentile, print_results, run_concurrent
+
+PASSWORD = "bench-login-password"
+EMAIL = "bench-login@example.com"
+
+
+def measure_bystander(client, route, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        client.get(route)
+        latencies.append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--bystander", default="/ready")
+    args = parser.parse_args()
+
+    app = import_app(BCRYPT_LOG_ROUNDS=args.rounds, ENSURE_INDEXES="0")
+    from passwords import PasswordHasher, SlidingWindowLimiter
+
+    unlimited = SlidingWindowLimiter(limit=10 ** 9, window=60)
+    user_id = app.users_collection.insert_one({
+        "name": "Bench User", "email": EMAIL, "role": "user",
+        "password": PasswordHasher(rounds=args.rounds, workers=0).hash(PASSWORD),
+    }).inserted_id
+
+    def login(password, expected):
+        def post():
+            # A fresh client each time: a logged-in session would be redirected before any password check
+            response = app.app.test_client().post("/login", data={"email": EMAIL, "password": password})
+            if response.status_code not in expected:
+                raise RuntimeError(f"/login returned {response.status_code}")
+        return post
+
+    scenarios = [
+        ("inline", 0, unlimited, login(PASSWORD, (302,))),
+        ("pool", args.workers, unlimited, login(PASSWORD, (302,))),
+        ("limited", args.workers, None, login("wrong-password", (200, 429))),
+    ]
+    rows = []
+    try:
+        for mode, workers, limiter, post in scenarios:
+            app.password_hasher = PasswordHasher(rounds=args.rounds, workers=workers)
+            app.password_hasher.hash(PASSWORD)  # start the pool processes outside the timings
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                app.login_attempts_by_ip = limiter or SlidingWindowLimiter(
+                    int(os.getenv("LOGIN_RATE_LIMIT_IP", 30)), app.LOGIN_RATE_WINDOW)
+                app.login_attempts_by_email = limiter or SlidingWindowLimiter(
+                    int(os.getenv("LOGIN_RATE_LIMIT_EMAIL", 10)), app.LOGIN_RATE_WINDOW)
+                stop = threading.Event()
+                bystander = []
+                watcher = threading.Thread(target=measure_bystander,
+                                           args=(app.app.test_client(), args.bystander, stop, bystander))
+                watcher.start()
+                try:
+                    result = run_concurrent(post, concurrency, args.calls)
+                finally:
+                    stop.set()
+                    watcher.join()
+                rows.append({
+                    "mode": mode, "workers": workers, **result,
+                    "bystander_p50_ms": round(percentile(bystander, 50) * 1000, 2),
+                    "bystander_p99_ms": round(percentile(bystander, 99) * 1000, 2),
+                })
+            app.password_hasher.shutdown()
+    finally:
+        app.users_collection.delete_one({"_id": user_id})
+
+    print_results(f"POST /login at bcrypt cost {args.rounds}, bystander {args.bystander}", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Aggregate inference throughput and memory against the number of web worker processes.
+
+"local" gives every worker process its own model (today's gunicorn setup);
+"shared" starts model_server.py once and has every worker send it arrays
+over the Unix socket. Each worker runs --threads request threads, like
+gunicorn's --threads.
+
+Usage: python benchmarks/bench_model_server.py [--backend keras] [--workers 1,2,4,8]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from _util import REPO_ROOT, print_results, run_concurrent
+
+
+def peak_rss_mb(pid=None):
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def worker(mode, backend, socket_path, threads, calls, ready, start_event, results):
+    from inference import CLASS_NAMES, InferenceBatcher, load_backend
+    from model_server import ModelServerClient
+
+    if mode == "shared":
+        predictor = ModelServerClient(socket_path)
+    else:
+        predictor = InferenceBatcher(load_backend(backend), CLASS_NAMES)
+
+    img = np.random.default_rng(0).uniform(0, 255, (256, 256, 3)).astype("float32")
+    predictor.predict(img)
+    ready.put(os.getpid())
+    start_event.wait()
+    stats = run_concurrent(lambda: predictor.predict(img), threads, calls)
+    results.put({"errors": stats["errors"], "rss_mb": peak_rss_mb()})
+
+
+def run(mode, backend, socket_path, workers, threads, calls):
+    ctx = multiprocessing.get_context("spawn")
+    ready, start_event, results = ctx.Queue(), ctx.Event(), ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(mode, backend, socket_path, threads, calls, ready, start_event, results))
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    # Model loading and the first prediction are not part of the timed run
+    for _ in procs:
+        ready.get()
+
+    wall_start = time.perf_counter()
+    start_event.set()
+    rows = [results.get() for _ in procs]
+    wall = time.perf_counter() - wall_start
+    for proc in procs:
+        proc.join()
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "threads_per_worker": threads,
+        "calls": workers * calls,
+        "errors": sum(r["errors"] for r in rows),
+        "throughput_rps": round(workers * calls / wall, 2),
+        "worker_rss_mb_total": round(sum(r["rss_mb"] for r in rows), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", default="keras")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=64, help="Predictions per worker.")
+    args = parser.parse_args()
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "model.sock")
+    server = subprocess.Popen(
+        [sys.executable, "model_server.py", "--socket", socket_path, "--backend", args.backend],
+        cwd=REPO_ROOT,
+    )
+    try:
+        rows = []
+        for workers in [int(w) for w in args.workers.split(",")]:
+            rows.append(run("local", args.backend, socket_path, workers, args.threads, args.calls))
+            row = run("shared", args.backend, socket_path, workers, args.threads, args.calls)
+            row["server_rss_mb"] = round(peak_rss_mb(server.pid), 1)
+            rows.append(row)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print_results(f"model serving ({args.backend}, {args.threads} threads per worker)", rows)
+
+
+if __name__ == "__main__":
+    main()
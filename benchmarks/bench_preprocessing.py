@@ -0,0 +1,95 @@
+"""Decode time and peak memory of image preprocessing on large camera photos.
+
+"baseline" is the previous path (full decode, resize, float32 copy);
+"draft" is inference.preprocess_image writing into a reused buffer, from a
+file path and from in-memory upload bytes. Each mode runs in its own
+subprocess so peak RSS is not shared between them.
+
+Usage: python benchmarks/bench_preprocessing.py [--size 4032x3024] [--calls 30]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from _util import percentile, print_results
+
+MODES = ["baseline", "draft", "draft_stream"]
+
+
+def make_photo(path, size):
+    """A noisy gradient saved as a high-quality JPEG, roughly the size of a phone photo."""
+    width, height = size
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    pixels = np.clip(gradient + rng.normal(0, 40, (height, width, 3)), 0, 255).astype(np.uint8)
+    Image.fromarray(pixels).save(path, quality=92)
+
+
+def baseline(source):
+    return np.asarray(Image.open(source).resize((256, 256)), dtype=np.float32)
+
+
+def measure(mode, path, calls):
+    from inference import image_buffer, preprocess_image
+
+    with open(path, "rb") as f:
+        data = f.read()
+    if mode == "baseline":
+        run = lambda: baseline(path)
+    elif mode == "draft":
+        run = lambda: preprocess_image(path, out=image_buffer())
+    else:
+        run = lambda: preprocess_image(io.BytesIO(data), out=image_buffer())
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        run()
+        latencies.append((time.perf_counter() - start) * 1000)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "mode": mode,
+        "file_mb": round(len(data) / 1e6, 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "peak_rss_mb": round(rss_after / 1024, 1),
+        "peak_rss_growth_mb": round((rss_after - rss_before) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", default="4032x3024")
+    parser.add_argument("--calls", type=int, default=30)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], args.child[1], args.calls)))
+        return
+
+    path = os.path.join(tempfile.mkdtemp(), "photo.jpg")
+    make_photo(path, tuple(int(v) for v in args.size.split("x")))
+    rows = []
+    for mode in MODES:
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", mode, path, "--calls", str(args.calls)],
+            capture_output=True, text=True, check=True,
+        )
+        rows.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    print_results(f"preprocessing a {args.size} JPEG", rows)
+
+
+if __name__ == "__main__":
+    main()
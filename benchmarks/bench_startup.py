@@ -0,0 +1,114 @@
+"""Cold-start cost of app.py: per-module import time and time until the first request is served.
+
+Import times come from `python -X importtime -c "import app"` (top-level
+imports only, cumulative). The serve timings start a fresh `flask run`
+process and poll /login for the first 200 and /ready for model readiness.
+
+Usage: python benchmarks/bench_startup.py [--modes lazy,eager] [--top 15]
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+from _util import REPO_ROOT, print_results
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def bench_env(mode):
+    env = dict(os.environ, STARTUP_MODE=mode, ENSURE_INDEXES="0")
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017/plant_care_bench")
+    env.setdefault("GEMINI_API_KEY", "bench")
+    return env
+
+
+def parse_importtime(stderr):
+    """Returns {module: cumulative_ms} for modules imported directly by app.py's import."""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        # Nesting is shown by two extra spaces per level; level 1 is what `import app` pulled in
+        if len(indent) <= 3:
+            modules[name] = round(int(cumulative_us) / 1000, 1)
+    return modules
+
+
+def measure_imports(mode, top):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=REPO_ROOT, env=bench_env(mode), capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    modules = parse_importtime(result.stderr)
+    slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "mode": mode,
+        "import_app_ms": modules.get("app"),
+        "process_wall_s": round(wall, 2),
+        "slowest_imports_ms": dict(slowest),
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url, deadline):
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def measure_serving(mode, timeout):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port)],
+        cwd=REPO_ROOT, env=bench_env(mode), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + timeout
+        first_request = time.monotonic() - start if wait_for(f"{base_url}/login", deadline) else None
+        ready = time.monotonic() - start if wait_for(f"{base_url}/ready", deadline) else None
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "mode": mode,
+        "first_request_s": round(first_request, 2) if first_request is not None else None,
+        "ready_s": round(ready, 2) if ready is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", default="lazy,eager")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--timeout", type=float, default=180)
+    args = parser.parse_args()
+
+    modes = args.modes.split(",")
+    print_results("import app (-X importtime)", [measure_imports(mode, args.top) for mode in modes])
+    print_results("time to first served request / readiness", [measure_serving(mode, args.timeout) for mode in modes])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Requests per second on an authenticated route with and without the load_user cache.
+
+`/calendar` only renders a template, so the users lookup in load_user is the
+only database round-trip per request. Needs a mongod at MONGO_URI (defaults to
+a local `plant_care_bench` database); a throwaway user is created and removed.
+
+Usage: python benchmarks/bench_user_cache.py [--concurrency 1,4,8] [--calls 2000]
+"""
+import argparse
+import threading
+
+from _util import import_app, print_results, run_concurrent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--route", default="/calendar")
+    args = parser.parse_args()
+
+    app = import_app()
+    from cache import MemoryCache
+
+    user_id = app.users_collection.insert_one({
+        "name": "Bench User", "email": "bench-user-cache@example.com", "password": "x", "role": "user"
+    }).inserted_id
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, "client"):
+            local.client = app.app.test_client()
+            with local.client.session_transaction() as session:
+                session["_user_id"] = str(user_id)
+                session["_fresh"] = True
+        return local.client
+
+    def request_route():
+        response = client().get(args.route)
+        if response.status_code != 200:
+            raise RuntimeError(f"{args.route} returned {response.status_code}")
+
+    rows = []
+    try:
+        for mode, ttl in (("uncached", 0), ("cached", 30)):
+            app.user_cache = MemoryCache(maxsize=4096, ttl=ttl)
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                rows.append({"mode": mode, **run_concurrent(request_route, concurrency, args.calls)})
+    finally:
+        app.users_collection.delete_one({"_id": user_id})
+
+    print_results(f"load_user cache on {args.route}", rows)
+
+
+if __name__ == "__main__":
+    main()
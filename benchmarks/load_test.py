@@ -0,0 +1,288 @@
+"""End-to-end load test: the whole Flask app against local stand-ins, at increasing concurrency.
+
+Everything runs in this process:
+- the app, served by werkzeug's threaded server on a free local port
+- MongoDB: a local mongod (--mongo-uri, the faithful option) or mongomock
+  (--mongo-uri mongomock; best effort: it lacks the $substrCP projection the
+  logbook uses, so /logbook is left out of the mix and the report says so)
+- the Gemini API: StubGeminiServer (--llm-latency)
+- OpenWeatherMap: StubWeatherServer (--weather-latency)
+- the model: a tiny Keras model with the real input/output shapes, built on the fly
+
+Seeded users log in once, then each virtual user thread sends a weighted mix
+of /dashboard, /diagnose (upload), /logbook, /api/calendar_events and
+/api/toggle_task requests. Each concurrency level reports throughput,
+p50/p95/p99 overall and per route, and errors. Peak RSS is for the whole
+process, so it includes the load driver. Any failed request makes the run exit
+non-zero and nothing is written to --output, since error-path timings would
+skew the numbers. Results are written as JSON so two builds can be compared:
+
+    python benchmarks/load_test.py --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/load_test.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import requests
+from PIL import Image
+
+from _util import REPO_ROOT, import_app, percentile, print_results
+from stubs import StubGeminiServer, StubWeatherServer
+
+ROUTE_MIX = {
+    "dashboard": 30,
+    "logbook": 20,
+    "calendar_events": 25,
+    "toggle_task": 15,
+    "diagnose": 10,
+}
+PASSWORD = "load-test-password"
+LOCATIONS = ["Kandy", "Kurunegala", "Matale", "Badulla"]
+
+
+def make_stub_model(path, classes=12):
+    """A few-kilobyte Keras model with the production model's input and output shapes."""
+    import keras
+    inputs = keras.Input((256, 256, 3))
+    x = keras.layers.Rescaling(1 / 255)(inputs)
+    x = keras.layers.Conv2D(4, 3, strides=4, activation="relu")(x)
+    x = keras.layers.GlobalAveragePooling2D()(x)
+    keras.Model(inputs, keras.layers.Dense(classes)(x)).save(path)
+
+
+def make_upload(seed, size=(1280, 960)):
+    """A phone-sized JPEG; a different seed gives different bytes, so uploads aren't prediction-cache hits."""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).resize(size).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_data(app, users, tasks_per_user, diagnoses_per_user):
+    password_hash = app.password_hasher.hash(PASSWORD)
+    now = datetime.now()
+    accounts = []
+    for i in range(users):
+        user_id = app.users_collection.insert_one({
+            "name": f"Load User {i}", "email": f"load-{i}@example.com", "password": password_hash,
+            "crop_location": LOCATIONS[i % len(LOCATIONS)], "role": "user",
+        }).inserted_id
+        app.tasks_collection.insert_many([{
+            "user_id": user_id, "description": f"Task {n}", "due_date": now + timedelta(days=n % 30 - 5),
+            "is_all_day": True, "is_completed": False, "created_at": now,
+        } for n in range(tasks_per_user)])
+        app.diagnoses_collection.insert_many([{
+            "user_id": user_id, "plant_identifier": f"Plant {n}", "disease_name": "Anthracnose",
+            "confidence": "91.20%", "suggestions": {"description": "A fungal disease.", "schedule": []},
+            "image_path": "uploads/blobs/00/missing.jpg", "image_hash": f"seed-{i}-{n}",
+            "status": "complete", "timestamp": now - timedelta(hours=n),
+        } for n in range(diagnoses_per_user)])
+        task_ids = [str(t["_id"]) for t in app.tasks_collection.find({"user_id": user_id}, {"_id": 1})]
+        accounts.append({"email": f"load-{i}@example.com", "task_ids": task_ids})
+    return accounts
+
+
+class VirtualUser:
+    def __init__(self, base_url, account, seed):
+        self.base_url = base_url
+        self.account = account
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        response = self.session.post(f"{base_url}/login", data={"email": account["email"], "password": PASSWORD},
+                                     allow_redirects=False)
+        if response.status_code != 302:
+            raise RuntimeError(f"Login failed for {account['email']}: {response.status_code}")
+
+    def request(self, route):
+        if route == "dashboard":
+            return self.session.get(f"{self.base_url}/dashboard")
+        if route == "logbook":
+            return self.session.get(f"{self.base_url}/logbook")
+        if route == "calendar_events":
+            today = datetime.now().date()
+            return self.session.get(f"{self.base_url}/api/calendar_events", params={
+                "start": (today - timedelta(days=today.day)).isoformat(),
+                "end": (today + timedelta(days=35)).isoformat(),
+            })
+        if route == "toggle_task":
+            return self.session.post(f"{self.base_url}/api/toggle_task/{self.rng.choice(self.account['task_ids'])}")
+        image = make_upload(self.rng.getrandbits(32))
+        return self.session.post(f"{self.base_url}/diagnose", allow_redirects=False,
+                                 data={"plant_identifier": "Load test"},
+                                 files={"file": ("photo.jpg", image, "image/jpeg")})
+
+
+def run_level(base_url, accounts, concurrency, total_requests, seed, route_mix=ROUTE_MIX):
+    routes, weights = zip(*route_mix.items())
+    samples = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = iter(range(total_requests))
+    users = [VirtualUser(base_url, accounts[i % len(accounts)], seed + i) for i in range(concurrency)]
+
+    def drive(user):
+        nonlocal errors
+        for _ in remaining:
+            route = user.rng.choices(routes, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = user.request(route).status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append((route, elapsed))
+                errors += not ok
+
+    threads = [threading.Thread(target=drive, args=(user,)) for user in users]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    def summarise(latencies):
+        return {
+            "requests": len(latencies),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        }
+
+    return {
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(len(samples) / wall, 2) if wall else 0.0,
+        **summarise([latency for _, latency in samples]),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "routes": {route: summarise([l for r, l in samples if r == route]) for route in routes},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {level["concurrency"]: level for level in json.load(f)["levels"]}
+    with open(new_path) as f:
+        new = {level["concurrency"]: level for level in json.load(f)["levels"]}
+    rows = []
+    for concurrency in sorted(old.keys() & new.keys()):
+        row = {"concurrency": concurrency}
+        for field in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+            before, after = old[concurrency][field], new[concurrency][field]
+            change = f"{(after - before) / before:+.1%}" if before else "n/a"
+            row[field] = f"{before} -> {after} ({change})"
+        rows.append(row)
+    print_results(f"{old_path} vs {new_path}", rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017/plant_care_load",
+                        help="A local mongod database (dropped first), or 'mongomock'.")
+    parser.add_argument("--concurrency", default="1,4,8,16,32")
+    parser.add_argument("--requests-per-level", type=int, default=400)
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--weather-latency", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here as well as printing it.")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two saved reports and exit.")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="plant-care-load-")
+    model_path = os.path.join(workdir, "stub_model.keras")
+    make_stub_model(model_path)
+
+    route_mix = dict(ROUTE_MIX)
+    if args.mongo_uri == "mongomock":
+        import flask_pymongo
+        import mongomock
+        flask_pymongo.MongoClient = mongomock.MongoClient
+        mongo_uri = "mongodb://localhost:27017/plant_care_load"
+        del route_mix["logbook"]
+        print("# mongomock: /logbook left out of the route mix")
+    else:
+        mongo_uri = args.mongo_uri
+
+    with StubGeminiServer(latency=args.llm_latency) as gemini, StubWeatherServer(latency=args.weather_latency) as weather:
+        app = import_app(
+            MONGO_URI=mongo_uri, GEMINI_API_ENDPOINT=gemini.base_url, OPENWEATHER_BASE_URL=weather.base_url,
+            WEATHER_API_KEY="load", INFERENCE_BACKEND="keras", INFERENCE_MODEL_PATH=model_path,
+            STARTUP_MODE="eager", ENSURE_INDEXES="0",
+            # Every virtual user logs in from 127.0.0.1; the load test measures routes, not the login limits
+            LOGIN_RATE_LIMIT_IP=10 ** 9, LOGIN_RATE_LIMIT_EMAIL=10 ** 9,
+        )
+        for collection in ("users", "diagnoses", "tasks", "upload_blobs", "stats"):
+            app.mongo.db.drop_collection(collection)
+        if args.mongo_uri != "mongomock":
+            app.ensure_indexes()
+        app.upload_store.static_root = os.path.join(workdir, "static")
+        accounts = seed_data(app, args.users, tasks_per_user=40, diagnoses_per_user=60)
+
+        from werkzeug.serving import make_server
+        port = free_port()
+        server = make_server("127.0.0.1", port, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{port}"
+
+        levels = []
+        try:
+            run_level(base_url, accounts, 2, 20, args.seed, route_mix)  # warm-up: templates, connection pools, model graph
+            for concurrency in [int(c) for c in args.concurrency.split(",")]:
+                levels.append(run_level(base_url, accounts, concurrency, args.requests_per_level, args.seed, route_mix))
+                print_results(f"concurrency {concurrency}", [levels[-1]])
+        finally:
+            server.shutdown()
+
+    report = {
+        "revision": git_revision(),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "route_mix": route_mix,
+        "levels": levels,
+    }
+    print(json.dumps(report))
+    failed = [level["concurrency"] for level in levels if level["errors"]]
+    if failed:
+        print(f"Requests failed at concurrency {', '.join(map(str, failed))}; not writing a report.", file=sys.stderr)
+        sys.exit(1)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
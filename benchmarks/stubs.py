@@ -0,0 +1,227 @@
+"""Local stand-ins for the external services the app calls, with configurable latency."""
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+SUGGESTIONS_TEXT = """### Description
+A fungal disease that causes dark streaks on the leaves.
+
+### Treatment Plan
+1. Remove infected leaves.
+2. Apply a recommended fungicide.
+
+### Prevention
+- Keep good spacing between plants.
+
+### Generated Treatment Schedule
+| Date (Relative) | Task | Details |
+|---|---|---|
+| Today | Remove infected leaves | Cut and burn affected leaves |
+| Day 7 (Week 1) | Apply fungicide | Spray the underside of the leaves |
+| Day 14 (Week 2) | Inspect plants | Look for new streaks |
+"""
+
+INNOVATIONS_TEXT = """### Headline
+Drone spraying cuts Sigatoka losses
+
+### Summary
+Growers are using small drones to target fungicide applications on banana plantations.
+"""
+
+
+def weather_payload():
+    return {
+        "name": "Kandy",
+        "weather": [{"main": "Clouds", "icon": "04d"}],
+        "main": {"temp": 27.3, "humidity": 78, "feels_like": 29.1, "temp_max": 29.0, "temp_min": 23.5},
+        "wind": {"speed": 3.2},
+    }
+
+
+def forecast_payload():
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    items = []
+    for step in range(40):
+        at = now + timedelta(hours=3 * step)
+        items.append({
+            "dt": int(at.timestamp()),
+            "dt_txt": at.strftime("%Y-%m-%d %H:00:00"),
+            "weather": [{"main": "Rain" if step % 4 == 0 else "Clouds", "icon": "10d"}],
+            "main": {"temp": 26.0, "humidity": 80, "feels_like": 28.0, "temp_max": 29.0, "temp_min": 23.0},
+            "wind": {"speed": 2.5},
+            "pop": 0.4,
+        })
+    return {"city": {"name": "Kandy"}, "list": items}
+
+
+class StubWeatherServer:
+    """OpenWeatherMap-compatible /weather and /forecast endpoints served from a local thread."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                path = urlparse(self.path).path
+                if path.endswith("/weather"):
+                    body = weather_payload()
+                elif path.endswith("/forecast"):
+                    body = forecast_payload()
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/data/2.5"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def canned_llm_text(prompt):
+    if "### Headline" in prompt:
+        return INNOVATIONS_TEXT
+    if "### Generated Treatment Schedule" in prompt:
+        return SUGGESTIONS_TEXT
+    return "High humidity increases fungal risk, so ensure good air circulation."
+
+
+class StubGeminiServer:
+    """Gemini REST API stand-in (generateContent / streamGenerateContent) with injectable latency and failures.
+
+    Point the app at it with GEMINI_API_ENDPOINT=<base_url>. `latency` and
+    `failure_rate` can be changed while it runs; failures are 503 UNAVAILABLE.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, chunks=8):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.chunks = chunks
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                stub.requests += 1
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompt = "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+                path = urlparse(self.path).path
+
+                if random.random() < stub.failure_rate:
+                    time.sleep(stub.latency / 2)
+                    self._send_json(503, {"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}})
+                    return
+
+                text = canned_llm_text(prompt)
+                if path.endswith(":streamGenerateContent"):
+                    size = max(1, len(text) // stub.chunks)
+                    pieces = [self._candidate(text[i:i + size]) for i in range(0, len(text), size)]
+                    encoded = [json.dumps(piece) for piece in pieces]
+                    payload = ("[" + ",\r\n".join(encoded) + "]").encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    # Write chunk by chunk so the client sees a real stream
+                    offset = 0
+                    for i, piece in enumerate(encoded):
+                        time.sleep(stub.latency / len(encoded))
+                        end = len(("[" + ",\r\n".join(encoded[:i + 1])).encode())
+                        self.wfile.write(payload[offset:end])
+                        self.wfile.flush()
+                        offset = end
+                    self.wfile.write(payload[offset:])
+                elif path.endswith(":generateContent"):
+                    time.sleep(stub.latency)
+                    self._send_json(200, self._candidate(text))
+                else:
+                    self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+            def _candidate(self, text):
+                return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}]}
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeGeminiModel:
+    """Drop-in for `genai.GenerativeModel` that sleeps for `latency` seconds and returns canned markdown."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        text = canned_llm_text(prompt)
+        if stream:
+            return self._stream(text)
+        time.sleep(self.latency)
+        return SimpleNamespace(text=text)
+
+    def _stream(self, text, chunks=8):
+        """Yields `text` in a few chunks spread over the configured latency."""
+        size = max(1, len(text) // chunks)
+        for start in range(0, len(text), size):
+            time.sleep(self.latency / chunks)
+            yield SimpleNamespace(text=text[start:start + size])
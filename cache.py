@@ -0,0 +1,212 @@
+import threading
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+from cachetools import TTLCache
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters for a cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class MemoryCache:
+    """Per-process LRU/TTL cache that coalesces concurrent misses for the same key into one computation."""
+
+    def __init__(self, maxsize=256, ttl=600):
+        self.stats = CacheStats()
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def get(self, key):
+        with self._lock:
+            value = self._memory.get(key)
+        self.stats.record(value is not None)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True):
+        """Returns the cached value for `key`; on a miss only one thread runs `compute()` and the rest wait for it."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self.stats.record(True)
+                return value
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            self.stats.record(True)
+            return future.result()
+
+        self.stats.record(False)
+        try:
+            value = compute()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            if cacheable(value):
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def snapshot(self):
+        stats = self.stats.snapshot()
+        with self._lock:
+            stats["size"] = len(self._memory)
+        return stats
+
+
+class TieredCache:
+    """LRU/TTL cache held in process memory and backed by a Mongo collection shared by every worker.
+
+    Entries are stored under `_id = key` together with a `version` string; an
+    entry written under a different version (e.g. by an older model file) is
+    treated as a miss. With `refresh_after` set, `get_or_compute` serves
+    entries older than that from cache while recomputing them in the
+    background.
+    """
+
+    def __init__(self, collection, maxsize=1024, ttl=3600, version=None, refresh_after=None):
+        self.collection = collection
+        self.ttl = ttl
+        self.version = version
+        self.refresh_after = refresh_after
+        self.stats = CacheStats()
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def get(self, key):
+        entry = self._lookup(key)
+        return entry[0] if entry else None
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True, refresh=None):
+        """Returns the cached value for `key`, computing and storing it on a miss.
+
+        `refresh`, if given, is used instead of `compute` for background
+        refreshes, so a `compute` tied to one request isn't run on its behalf later.
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            value = compute()
+            if cacheable(value):
+                self.set(key, value)
+            return value
+
+        value, created_at = entry
+        if self.refresh_after is not None and datetime.now() - created_at > timedelta(seconds=self.refresh_after):
+            self._refresh_in_background(key, refresh or compute, cacheable)
+        return value
+
+    def _refresh_in_background(self, key, compute, cacheable):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = compute()
+                if cacheable(value):
+                    self.set(key, value)
+            except Exception as e:
+                print(f"Cache refresh error for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"cache-refresh-{key}", daemon=True).start()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is not None:
+            self.stats.record(True)
+            return entry
+
+        doc = None
+        try:
+            doc = self.collection.find_one({
+                "_id": key,
+                "version": self.version,
+                "created_at": {"$gte": datetime.now() - timedelta(seconds=self.ttl)},
+            })
+        except Exception as e:
+            print(f"Cache lookup error: {e}")
+
+        if doc:
+            entry = (doc["value"], doc["created_at"])
+            with self._lock:
+                self._memory[key] = entry
+            self.stats.record(True)
+            return entry
+
+        self.stats.record(False)
+        return None
+
+    def set(self, key, value):
+        created_at = datetime.now()
+        with self._lock:
+            self._memory[key] = (value, created_at)
+        try:
+            self.collection.replace_one(
+                {"_id": key},
+                {"_id": key, "version": self.version, "value": value, "created_at": created_at},
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"Cache write error: {e}")
+
+    def clear(self):
+        """Drops the in-memory tier and every stored entry for this version."""
+        with self._lock:
+            self._memory.clear()
+        try:
+            self.collection.delete_many({"version": self.version})
+        except Exception as e:
+            print(f"Cache clear error: {e}")
+
+    def snapshot(self):
+        stats = self.stats.snapshot()
+        with self._lock:
+            stats["size"] = len(self._memory)
+        return stats
@@ -0,0 +1,408 @@
+"""Model loading, preprocessing and batched inference for the banana disease classifier.
+
+Run as a script for the offline tools:
+
+    python inference.py convert --quantize dynamic --output banana_disease_model.tflite
+    python inference.py parity --candidate banana_disease_model.tflite --backend tflite
+"""
+import argparse
+import os
+import queue
+import sys
+import tarfile
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+# BATCHING CONFIGURATION
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 8))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 5))
+
+CLASS_NAMES = ['Anthracnose', 'Banana Fruit-Scarring Beetle', 'Banana Split Peel', 'Healthy Banana', 'Leaf Banana Black Sigatoka Disease', 'Leaf Banana Bract Mosaic Virus Disease', 'Leaf Banana Healthy Leaf', 'Leaf Banana Insect Pest Disease', 'Leaf Banana Moko Disease', 'Leaf Banana Natural Death', 'Leaf Banana Panama Disease', 'Leaf Banana Yellow Sigatoka Disease']
+IMAGE_SIZE = (256, 256)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+_buffers = threading.local()
+
+
+def image_buffer():
+    """A (256, 256, 3) float32 array reused by every preprocess_image call on this thread.
+
+    Only safe when the caller is done with the previous image, e.g. after a
+    blocking predict() has returned.
+    """
+    buffer = getattr(_buffers, "image", None)
+    if buffer is None:
+        buffer = _buffers.image = np.empty((*IMAGE_SIZE, 3), dtype=np.float32)
+    return buffer
+
+
+def preprocess_image(source, out=None):
+    """Decodes an image path or file-like object into the (256, 256, 3) float32 RGB array the model expects.
+
+    JPEGs are decoded in draft mode, i.e. already downscaled by the decoder to
+    the smallest 1/2, 1/4 or 1/8 scale that is still at least 256x256, so a
+    12 MP camera photo never has to be decoded at full resolution. Palette,
+    greyscale, CMYK and transparent images are converted to RGB explicitly,
+    with transparency flattened onto white. The pixels are written into `out`
+    when given instead of allocating a new array.
+    """
+    with Image.open(source) as img:
+        img.draft('RGB', IMAGE_SIZE)
+        if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+            rgba = img.convert('RGBA')
+            img = Image.new('RGB', rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel('A'))
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        img = img.resize(IMAGE_SIZE)
+
+    if out is None:
+        out = np.empty((*IMAGE_SIZE, 3), dtype=np.float32)
+    # Cast the uint8 pixels straight into the float32 buffer without an intermediate array
+    np.copyto(out, np.asarray(img))
+    return out
+
+
+# INFERENCE BACKENDS
+# Every backend exposes predict_on_batch(batch) -> raw model outputs, like a Keras model.
+class KerasBackend:
+    """The original .keras model on the full TensorFlow runtime."""
+
+    def __init__(self, model_path):
+        from tensorflow.keras.models import load_model
+        self.model = load_model(model_path)
+
+    def predict_on_batch(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class TFLiteBackend:
+    """A converted .tflite model. Uses the standalone LiteRT interpreter when installed, so
+    TensorFlow itself does not have to be loaded."""
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                # tensorflow.lite is an attribute, not an importable module, in current TF releases
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads or os.cpu_count())
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def predict_on_batch(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self.input_index, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+class OnnxBackend:
+    """An ONNX export of the model, run with onnxruntime on the CPU."""
+
+    def __init__(self, model_path):
+        import onnxruntime
+        self.session = onnxruntime.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict_on_batch(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+BACKENDS = {
+    'keras': KerasBackend,
+    'tflite': TFLiteBackend,
+    'onnx': OnnxBackend,
+}
+DEFAULT_MODEL_PATHS = {
+    'keras': 'banana_disease_model.keras',
+    'tflite': 'banana_disease_model.tflite',
+    'onnx': 'banana_disease_model.onnx',
+}
+
+
+def load_backend(name, model_path=None):
+    """Loads `model_path` (or the backend's default file) with the named backend."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'; choose one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_path or DEFAULT_MODEL_PATHS[name])
+
+
+def softmax(logits):
+    """Row-wise softmax over a (batch, classes) array."""
+    exp = np.exp(logits - np.max(logits, axis=-1, keepdims=True))
+    return exp / np.sum(exp, axis=-1, keepdims=True)
+
+
+class InferenceBatcher:
+    """Gathers single-image requests from every request thread and runs them through the model in batches.
+
+    A background thread waits for the first queued image, keeps collecting until
+    either `max_batch_size` images are waiting or `max_wait_ms` has passed, then
+    does one forward pass and resolves each caller's future with its own
+    (predicted_class, confidence) pair. `observer(batch_size, seconds)`, if
+    given, is called with the duration of every forward pass.
+    """
+
+    def __init__(self, model, class_names, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, observer=None):
+        self.model = model
+        self.observer = observer
+        self.class_names = class_names
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, img_array):
+        """Queues one (256, 256, 3) image and returns a Future for its result."""
+        future = Future()
+        self._queue.put((img_array, future))
+        return future
+
+    def predict(self, img_array):
+        """Blocking helper used by request threads."""
+        return self.submit(img_array).result()
+
+    def close(self):
+        """Stops the background thread once the queued work has drained."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            self._process(self._collect(first))
+
+    def _process(self, batch):
+        arrays, futures = zip(*batch)
+        try:
+            start = time.perf_counter()
+            predictions = self.model.predict_on_batch(np.stack(arrays))
+            if self.observer:
+                self.observer(len(arrays), time.perf_counter() - start)
+            scores = softmax(np.asarray(predictions))
+        except Exception as e:
+            print(f"Inference Error: {e}")
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, score in zip(futures, scores):
+            index = int(np.argmax(score))
+            future.set_result((self.class_names[index], float(100 * score[index])))
+
+
+class WarmedPredictor:
+    """Builds a predictor (anything with predict(img_array)) off the request path and reports its state.
+
+    `start()` runs `factory()` plus one throw-away prediction in a background
+    thread so the web server can come up before TensorFlow and the model have
+    loaded; `load()` does the same synchronously. `predict()` waits for the
+    load to finish. A failed load is retried at most every `retry_interval`
+    seconds, and `check()` pings a loaded predictor that supports it (the
+    model server client) so a server that has gone away shows as unavailable.
+    """
+
+    def __init__(self, factory, retry_interval=30):
+        self.factory = factory
+        self.retry_interval = retry_interval
+        self.state = "idle"
+        self.error = None
+        self.load_seconds = None
+        self._predictor = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._last_attempt = 0.0
+
+    def start(self):
+        self._ready.clear()
+        threading.Thread(target=self.load, name="model-warmup", daemon=True).start()
+
+    def load(self):
+        self.state = "loading"
+        self._last_attempt = time.monotonic()
+        start = time.perf_counter()
+        try:
+            predictor = self.factory()
+            # The first forward pass allocates tensors / traces the graph; keep it off user requests
+            predictor.predict(np.zeros((*IMAGE_SIZE, 3), dtype=np.float32))
+        except Exception as e:
+            print(f"Model load error: {e}")
+            self.error = str(e)
+            self.state = "failed"
+        else:
+            self._predictor = predictor
+            self.error = None
+            self.state = "ready"
+        self.load_seconds = round(time.perf_counter() - start, 3)
+        self._ready.set()
+
+    def predict(self, img_array):
+        self._ready.wait()
+        if self._predictor is None:
+            self._retry_if_due()
+            raise RuntimeError(f"Model failed to load: {self.error}")
+        return self._predictor.predict(img_array)
+
+    def check(self):
+        """Re-checks the predictor (retrying a failed load when due) and returns status()."""
+        if self._predictor is None:
+            self._retry_if_due()
+        elif hasattr(self._predictor, "ping"):
+            try:
+                self._predictor.ping()
+            except Exception as e:
+                self.state, self.error = "unavailable", str(e)
+            else:
+                self.state, self.error = "ready", None
+        return self.status()
+
+    def _retry_if_due(self):
+        with self._lock:
+            if self.state != "failed" or time.monotonic() - self._last_attempt < self.retry_interval:
+                return
+            self.state = "loading"
+        self.start()
+
+    def status(self):
+        return {"state": self.state, "error": self.error, "load_seconds": self.load_seconds}
+
+
+# OFFLINE TOOLS
+def iter_images(image_dir):
+    """Every image under `image_dir`, including the content-addressed upload store's
+    `blobs/<hh>/` folders; the store's `-thumb.webp` thumbnails are skipped."""
+    for root, dirs, files in os.walk(image_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS) and not name.endswith('-thumb.webp'):
+                yield os.path.join(root, name)
+
+
+def iter_image_files(source):
+    """Yields (name, bytes) for every image in a directory tree or a (optionally compressed) tar archive.
+
+    Archives are read as a stream, member by member, so neither is ever held
+    in memory or extracted to disk; `name` is the path relative to `source`.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    with open(path, 'rb') as f:
+                        yield os.path.relpath(path, source).replace(os.sep, '/'), f.read()
+        return
+
+    with tarfile.open(source, mode='r|*') as archive:
+        for member in archive:
+            if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield member.name, archive.extractfile(member).read()
+
+
+def convert_model(keras_path, output_path, quantize, image_dir):
+    """Converts the Keras model to TFLite (dynamic-range, float16 or int8 weights) or ONNX."""
+    import tensorflow as tf
+    model = tf.keras.models.load_model(keras_path)
+
+    if output_path.endswith('.onnx'):
+        import tf2onnx
+        spec = (tf.TensorSpec((None, *IMAGE_SIZE, 3), tf.float32, name='input'),)
+        tf2onnx.convert.from_keras(model, input_signature=spec, output_path=output_path)
+        return
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize in ('dynamic', 'float16', 'int8'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    if quantize == 'int8':
+        # Calibrate activation ranges on real uploads; inputs/outputs stay float32
+        def representative_dataset():
+            for path in list(iter_images(image_dir))[:200]:
+                yield [preprocess_image(path)[np.newaxis]]
+        converter.representative_dataset = representative_dataset
+
+    with open(output_path, 'wb') as f:
+        f.write(converter.convert())
+
+
+def check_parity(reference, candidate, image_dir):
+    """Top-1 agreement and largest probability difference between two backends over a folder of images."""
+    paths = list(iter_images(image_dir))
+    agree, max_diff = 0, 0.0
+    for path in paths:
+        batch = preprocess_image(path)[np.newaxis]
+        expected = softmax(reference.predict_on_batch(batch))[0]
+        actual = softmax(candidate.predict_on_batch(batch))[0]
+        agree += int(np.argmax(expected) == np.argmax(actual))
+        max_diff = max(max_diff, float(np.max(np.abs(expected - actual))))
+    return {'images': len(paths), 'top1_agreement': agree / len(paths) if paths else 0.0, 'max_prob_diff': max_diff}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline model conversion and accuracy-parity checks.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help="Convert the Keras model to TFLite or ONNX.")
+    convert.add_argument('--model', default=DEFAULT_MODEL_PATHS['keras'])
+    convert.add_argument('--output', default=DEFAULT_MODEL_PATHS['tflite'], help="A .tflite or .onnx path.")
+    convert.add_argument('--quantize', choices=['none', 'dynamic', 'float16', 'int8'], default='dynamic')
+    convert.add_argument('--images', default=os.path.join('static', 'uploads'), help="Calibration images for int8.")
+
+    parity = commands.add_parser('parity', help="Compare a converted model's predictions with the Keras model.")
+    parity.add_argument('--reference', default=DEFAULT_MODEL_PATHS['keras'])
+    parity.add_argument('--candidate', required=True)
+    parity.add_argument('--backend', choices=list(BACKENDS), default='tflite')
+    parity.add_argument('--images', default=os.path.join('static', 'uploads'))
+    parity.add_argument('--min-agreement', type=float, default=0.98)
+
+    args = parser.parse_args(argv)
+    if args.command == 'convert':
+        convert_model(args.model, args.output, args.quantize, args.images)
+        print(f"Wrote {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+        return 0
+
+    result = check_parity(load_backend('keras', args.reference), load_backend(args.backend, args.candidate), args.images)
+    print(f"{result['images']} images: top-1 agreement {result['top1_agreement']:.1%}, "
+          f"max probability difference {result['max_prob_diff']:.4f}")
+    return 0 if result['top1_agreement'] >= args.min_agreement else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
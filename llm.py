@@ -0,0 +1,279 @@
+import random
+import threading
+import time
+from collections import deque
+
+# google.api_core exception class names worth another attempt; anything else (bad
+# request, blocked prompt, auth) fails straight away and does not count against the breaker
+RETRYABLE_ERRORS = {
+    'DeadlineExceeded', 'ServiceUnavailable', 'ResourceExhausted', 'TooManyRequests',
+    'InternalServerError', 'BadGateway', 'GatewayTimeout', 'RetryError',
+    'TimeoutError', 'ConnectionError', 'ReadTimeout', 'ConnectTimeout', 'LLMTimeoutError',
+}
+
+
+class LLMUnavailableError(Exception):
+    """Raised without calling the API: the circuit is open or every slot stayed busy."""
+
+
+class LLMTimeoutError(Exception):
+    """The call ran past its deadline."""
+
+
+def is_retryable(error):
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+class LazyGeminiModel:
+    """Imports google.generativeai and builds the client on first use instead of at startup.
+
+    With `api_endpoint` set (e.g. a local fake server) the REST transport is
+    pointed at it instead of the Google endpoint.
+    """
+
+    def __init__(self, model_name, api_key=None, api_endpoint=None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self.api_endpoint = api_endpoint
+        self._model = None
+        self._lock = threading.Lock()
+
+    def generate_content(self, *args, **kwargs):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    if self.api_endpoint:
+                        genai.configure(api_key=self.api_key, transport='rest',
+                                        client_options={'api_endpoint': self.api_endpoint})
+                    else:
+                        genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model.generate_content(*args, **kwargs)
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one probe call through every `reset_timeout` seconds.
+
+    A probe that never reports back holds the half-open state for at most
+    `reset_timeout` seconds before another probe is let through.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if (self.state == 'open' and now - self.opened_at >= self.reset_timeout) or \
+                    (self.state == 'half_open' and now - self.probe_started_at >= self.reset_timeout):
+                self.state = 'half_open'
+                self.probe_started_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+class LLMMetrics:
+    """Per-call-type counters and recent latencies."""
+
+    FIELDS = ('calls', 'ok', 'errors', 'timeouts', 'retries', 'rejected')
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._latencies = {}
+
+    def _entry(self, call_type):
+        if call_type not in self._counters:
+            self._counters[call_type] = dict.fromkeys(self.FIELDS, 0)
+            self._latencies[call_type] = deque(maxlen=self.window)
+        return self._counters[call_type]
+
+    def record(self, call_type, field, latency=None):
+        with self._lock:
+            self._entry(call_type)[field] += 1
+            if latency is not None:
+                self._latencies[call_type].append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for call_type, counters in self._counters.items():
+                ordered = sorted(self._latencies[call_type])
+                stats = dict(counters)
+                for name, pct in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+                    stats[name] = round(ordered[min(len(ordered) - 1, int(pct * len(ordered)))] * 1000, 1) if ordered else 0.0
+                result[call_type] = stats
+            return result
+
+
+class LLMClient:
+    """Every Gemini call goes through here.
+
+    - at most `max_concurrency` calls run at once; a caller that can't get a
+      slot within `queue_timeout` fails fast instead of tying up its thread
+    - each call type has an overall deadline (`timeouts`), passed on to the
+      transport and used to bound retries
+    - retryable errors are retried up to `max_retries` times with full-jitter
+      exponential backoff, never past the deadline; a stream is only retried
+      if it failed before its first chunk
+    - a circuit breaker stops calling the API after repeated failures, so the
+      callers drop to their fallback text straight away
+    - `observer(call_type, outcome, seconds)`, if given, sees every finished attempt
+    """
+
+    def __init__(self, model, max_concurrency=4, timeouts=None, default_timeout=30, queue_timeout=2,
+                 max_retries=2, backoff_base=0.5, backoff_max=4, breaker=None, observer=None):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = LLMMetrics()
+        self.observer = observer
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    def generate(self, call_type, prompt):
+        """Returns the full response text."""
+        deadline = time.monotonic() + self.timeouts.get(call_type, self.default_timeout)
+        attempt = 0
+        while True:
+            self._admit(call_type, deadline)
+            start = time.monotonic()
+            try:
+                text = self.model.generate_content(prompt, request_options={'timeout': self._remaining(deadline)}).text
+                if time.monotonic() > deadline:
+                    raise LLMTimeoutError(f"{call_type} call exceeded its deadline")
+            except Exception as e:
+                if not self._should_retry(call_type, e, start, attempt, deadline):
+                    raise
+            else:
+                self._succeeded(call_type, start)
+                return text
+            finally:
+                self._release()
+            self._backoff(attempt, deadline)
+            attempt += 1
+
+    def stream(self, call_type, prompt):
+        """Yields the response text chunk by chunk."""
+        deadline = time.monotonic() + self.timeouts.get(call_type, self.default_timeout)
+        attempt = 0
+        while True:
+            self._admit(call_type, deadline)
+            start = time.monotonic()
+            started = False
+            try:
+                response = self.model.generate_content(
+                    prompt, stream=True, request_options={'timeout': self._remaining(deadline)})
+                for chunk in response:
+                    if time.monotonic() > deadline:
+                        raise LLMTimeoutError(f"{call_type} stream exceeded its deadline")
+                    started = True
+                    yield chunk.text
+            except GeneratorExit:
+                # The caller stopped reading (a client went away mid-page); the API was answering, so settle the breaker
+                self._succeeded(call_type, start)
+                raise
+            except Exception as e:
+                # Chunks already handed to the caller can't be taken back, so only a stream that failed before its first chunk is retried
+                if not self._should_retry(call_type, e, start, self.max_retries if started else attempt, deadline):
+                    raise
+            else:
+                self._succeeded(call_type, start)
+                return
+            finally:
+                self._release()
+            self._backoff(attempt, deadline)
+            attempt += 1
+
+    def snapshot(self):
+        with self._in_flight_lock:
+            in_flight = self._in_flight
+        return {
+            'circuit': self.breaker.snapshot(),
+            'in_flight': in_flight,
+            'max_concurrency': self.max_concurrency,
+            'calls': self.metrics.snapshot(),
+        }
+
+    def _remaining(self, deadline):
+        return max(0.1, deadline - time.monotonic())
+
+    def _admit(self, call_type, deadline):
+        if not self._slots.acquire(timeout=min(self.queue_timeout, max(0, deadline - time.monotonic()))):
+            self.metrics.record(call_type, 'rejected')
+            raise LLMUnavailableError(f"No free LLM slot for {call_type}")
+        if not self.breaker.allow():
+            self._slots.release()
+            self.metrics.record(call_type, 'rejected')
+            raise LLMUnavailableError("LLM circuit is open")
+        with self._in_flight_lock:
+            self._in_flight += 1
+        self.metrics.record(call_type, 'calls')
+
+    def _release(self):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _succeeded(self, call_type, start):
+        self.breaker.record_success()
+        self._record(call_type, 'ok', time.monotonic() - start)
+
+    def _should_retry(self, call_type, error, start, attempt, deadline):
+        """Records a failed attempt and decides whether another one fits before the deadline."""
+        latency = time.monotonic() - start
+        if not is_retryable(error):
+            # The API answered; this prompt or request is the problem, not availability
+            self.breaker.record_success()
+            self._record(call_type, 'errors', latency)
+            return False
+
+        self.breaker.record_failure()
+        timed_out = isinstance(error, LLMTimeoutError) or type(error).__name__ in ('DeadlineExceeded', 'ReadTimeout')
+        self._record(call_type, 'timeouts' if timed_out else 'errors', latency)
+        if attempt >= self.max_retries or time.monotonic() + self.backoff_base >= deadline:
+            return False
+        self.metrics.record(call_type, 'retries')
+        return True
+
+    def _record(self, call_type, field, latency):
+        self.metrics.record(call_type, field, latency)
+        if self.observer:
+            self.observer(call_type, field, latency)
+
+    def _backoff(self, attempt, deadline):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        time.sleep(min(delay, max(0, deadline - time.monotonic())))
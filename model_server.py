@@ -0,0 +1,187 @@
+"""A single local process that owns the model and serves predictions to every web worker.
+
+Web workers send preprocessed (256, 256, channels) float32 arrays over a Unix
+socket and get back (predicted_class, confidence). Requests from all workers
+go through one InferenceBatcher, so they are batched together and only this
+process pays for TensorFlow and the model weights.
+
+Wire format, both directions: a 4-byte big-endian length, a JSON header, then
+(requests only) the raw array bytes described by the header's shape/dtype.
+
+Usage: python model_server.py [--socket /tmp/plant-care-model.sock]
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+from inference import CLASS_NAMES, DEFAULT_MODEL_PATHS, InferenceBatcher, load_backend
+
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "/tmp/plant-care-model.sock")
+MODEL_SERVER_CONNECT_TIMEOUT = float(os.getenv("MODEL_SERVER_CONNECT_TIMEOUT", 120))
+# A hung server must not hold web threads forever; a prediction waits at most this long for its reply
+MODEL_SERVER_READ_TIMEOUT = float(os.getenv("MODEL_SERVER_READ_TIMEOUT", 30))
+LENGTH = struct.Struct("!I")
+
+
+class ModelServerError(Exception):
+    pass
+
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("model server connection closed")
+        received += n
+    return buf
+
+
+def _send_message(sock, header, payload=b""):
+    body = json.dumps(header).encode()
+    sock.sendall(LENGTH.pack(len(body)) + body)
+    if payload:
+        sock.sendall(payload)
+
+
+def _recv_header(sock):
+    (size,) = LENGTH.unpack(_recv_exact(sock, LENGTH.size))
+    return json.loads(_recv_exact(sock, size))
+
+
+class _PredictionHandler(socketserver.BaseRequestHandler):
+    """One persistent connection per client thread; answers requests until the client hangs up."""
+
+    def handle(self):
+        batcher = self.server.batcher
+        while True:
+            try:
+                header = _recv_header(self.request)
+            except (ConnectionError, OSError):
+                return
+            if header.get("op") == "ping":
+                _send_message(self.request, {"ok": True, "model": self.server.model_path})
+                continue
+
+            shape, dtype = tuple(header["shape"]), np.dtype(header["dtype"])
+            data = _recv_exact(self.request, int(np.prod(shape)) * dtype.itemsize)
+            img_array = np.frombuffer(data, dtype=dtype).reshape(shape)
+            try:
+                disease_name, confidence = batcher.predict(img_array)
+                _send_message(self.request, {"class": disease_name, "confidence": confidence})
+            except Exception as e:
+                _send_message(self.request, {"error": str(e)})
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, model, model_path):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.model_path = model_path
+        self.batcher = InferenceBatcher(model, CLASS_NAMES)
+        super().__init__(socket_path, _PredictionHandler)
+
+
+class ModelServerClient:
+    """Drop-in replacement for InferenceBatcher in a web worker; keeps one connection per thread."""
+
+    def __init__(self, socket_path=MODEL_SERVER_SOCKET, connect_timeout=MODEL_SERVER_CONNECT_TIMEOUT,
+                 read_timeout=MODEL_SERVER_READ_TIMEOUT):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._local = threading.local()
+
+    def _connection(self, connect_timeout=None):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            return sock
+
+        # The server may still be loading the model (or restarting) when a request arrives.
+        deadline = time.monotonic() + (self.connect_timeout if connect_timeout is None else connect_timeout)
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise ModelServerError(f"Model server is not listening on {self.socket_path}")
+                time.sleep(0.2)
+        sock.settimeout(self.read_timeout)
+        self._local.sock = sock
+        return sock
+
+    def _discard_connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+        self._local.sock = None
+
+    def _request(self, header, payload=b"", connect_timeout=None):
+        sock = self._connection(connect_timeout)
+        try:
+            _send_message(sock, header, payload)
+            return _recv_header(sock)
+        except TimeoutError:
+            # A reply may still arrive later and would be read as the answer to the next request
+            self._discard_connection()
+            raise ModelServerError(f"Model server did not answer within {self.read_timeout}s")
+
+    def ping(self, timeout=2):
+        """Checks the server answers, without waiting for a server that isn't listening."""
+        try:
+            return self._request({"op": "ping"}, connect_timeout=timeout)
+        except (ConnectionError, OSError):
+            self._discard_connection()
+            raise ModelServerError(f"Model server on {self.socket_path} is not answering")
+
+    def predict(self, img_array):
+        img_array = np.ascontiguousarray(img_array, dtype=np.float32)
+        header = {"shape": list(img_array.shape), "dtype": "float32"}
+        try:
+            reply = self._request(header, img_array.tobytes())
+        except (ConnectionError, OSError):
+            # A restarted server drops existing connections; retry once on a fresh one
+            self._discard_connection()
+            reply = self._request(header, img_array.tobytes())
+
+        if "error" in reply:
+            raise ModelServerError(reply["error"])
+        return reply["class"], reply["confidence"]
+
+    def close(self):
+        self._discard_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve model predictions to local web workers over a Unix socket.")
+    parser.add_argument("--socket", default=MODEL_SERVER_SOCKET)
+    parser.add_argument("--backend", default=os.getenv("INFERENCE_BACKEND", "keras"))
+    parser.add_argument("--model", default=os.getenv("INFERENCE_MODEL_PATH"))
+    args = parser.parse_args()
+
+    model_path = args.model or DEFAULT_MODEL_PATHS[args.backend]
+    server = ModelServer(args.socket, load_backend(args.backend, model_path), model_path)
+    print(f"Model server: {args.backend} model {model_path} listening on {args.socket}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import bcrypt
+from cachetools import TTLCache
+
+
+class HasherBusyError(Exception):
+    """Too many hashes are already queued; the caller should answer 503 rather than wait."""
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(hashed, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    except ValueError:
+        # Malformed stored hash, or a password longer than bcrypt's 72-byte limit
+        return False
+
+
+def hash_rounds(hashed):
+    """The cost factor stored in a `$2b$<rounds>$...` hash."""
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """bcrypt hashing and checking on a small process pool, off the request threads.
+
+    The pool size caps how many CPU cores password work can take from
+    inference and page rendering; at most `max_pending` hashes may be queued
+    and a caller that can't get a place within `queue_timeout` gets
+    HasherBusyError. With `workers=0` the work runs on the calling thread.
+    """
+
+    def __init__(self, rounds=12, workers=2, max_pending=32, queue_timeout=1.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn: never fork a process that has model and client threads running
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def submit(self, fn, *args):
+        """Runs `fn(*args)` in the pool and returns a Future."""
+        if not self._pending.acquire(timeout=self.queue_timeout):
+            raise HasherBusyError("Password hashing queue is full")
+        try:
+            if self.workers:
+                future = self._executor().submit(fn, *args)
+            else:
+                future = Future()
+                future.set_result(fn(*args))
+        except Exception:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def hash(self, password):
+        return self.submit(_hash_password, password, self.rounds).result()
+
+    def check(self, hashed, password):
+        return self.submit(_check_password, hashed, password).result()
+
+    def needs_rehash(self, hashed):
+        """True when the stored hash was made with a different cost factor than the configured one."""
+        return hash_rounds(hashed) != self.rounds
+
+    def rehash_in_background(self, password, on_done):
+        """Hashes `password` at the configured cost and calls `on_done(new_hash)` without blocking the caller."""
+        try:
+            future = self.submit(_hash_password, password, self.rounds)
+        except HasherBusyError:
+            return  # the next login will try again
+
+        def finished(future):
+            try:
+                on_done(future.result())
+            except Exception as e:
+                print(f"Password rehash error: {e}")
+
+        future.add_done_callback(finished)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class SlidingWindowLimiter:
+    """Allows at most `limit` hits per key in any `window` seconds (per process)."""
+
+    def __init__(self, limit, window, maxsize=10000):
+        self.limit = limit
+        self.window = window
+        self._hits = TTLCache(maxsize=maxsize, ttl=window)
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Records an attempt for `key`; returns False if it is over the limit."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = deque()
+            while hits and now - hits[0] >= self.window:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                self._hits[key] = hits
+                return False
+            hits.append(now)
+            self._hits[key] = hits
+            return True
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
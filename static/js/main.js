@@ -116,6 +116,78 @@ document.addEventListener('DOMContentLoaded', function() {
         calendar.render();
     }
 
+    // Diagnosis Progress (results page while the analysis is still running)
+    const progressCard = document.getElementById('diagnosis-progress');
+    if (progressCard) {
+        const diagnosisId = progressCard.dataset.diagnosisId;
+        const progressMessage = document.getElementById('diagnosis-progress-message');
+        const predictionName = document.getElementById('prediction-name');
+        const predictionConfidence = document.getElementById('prediction-confidence');
+        // Stop polling a job that never finishes (e.g. lost in a restart) instead of spinning forever
+        const pollGiveUpAt = Date.now() + 15 * 60 * 1000;
+        const maxPollErrors = 10;
+        let pollErrors = 0;
+
+        const giveUpPolling = () => {
+            progressMessage.textContent = 'This is taking longer than expected. Please check your logbook later or upload the image again.';
+        };
+
+        const pollDiagnosisStatus = () => {
+            if (Date.now() > pollGiveUpAt) {
+                giveUpPolling();
+                return;
+            }
+            fetch(`/api/diagnosis_status/${diagnosisId}`)
+                .then(response => response.json())
+                .then(data => {
+                    pollErrors = 0;
+                    if (data.disease_name) {
+                        predictionName.textContent = data.disease_name;
+                        predictionConfidence.textContent = data.confidence;
+                    }
+                    if (data.status === 'complete') {
+                        window.location.href = data.next_url;
+                        return;
+                    }
+                    if (data.status === 'failed' || data.status === 'error') {
+                        progressMessage.textContent = data.message;
+                        return;
+                    }
+                    // Fill in the advice sections streamed so far
+                    Object.entries(data.sections || {}).forEach(([key, html]) => {
+                        const section = progressCard.querySelector(`[data-section="${key}"]`);
+                        if (section) {
+                            section.querySelector('.section-body').innerHTML = html;
+                            section.hidden = false;
+                        }
+                    });
+                    if (data.schedule && data.schedule.length > 0) {
+                        const scheduleContainer = document.getElementById('progress-schedule');
+                        const tbody = scheduleContainer.querySelector('tbody');
+                        tbody.innerHTML = '';
+                        data.schedule.forEach(task => {
+                            const row = tbody.insertRow();
+                            [task.date, task.task, task.details].forEach(text => {
+                                row.insertCell().textContent = text;
+                            });
+                        });
+                        scheduleContainer.hidden = false;
+                    }
+                    progressMessage.innerHTML = `<i class="fa-solid fa-spinner fa-spin"></i> ${data.message}`;
+                    setTimeout(pollDiagnosisStatus, data.status === 'suggesting' ? 700 : 1500);
+                })
+                .catch(error => {
+                    console.error('Error checking diagnosis status:', error);
+                    if (++pollErrors >= maxPollErrors) {
+                        giveUpPolling();
+                        return;
+                    }
+                    setTimeout(pollDiagnosisStatus, 3000);
+                });
+        };
+        pollDiagnosisStatus();
+    }
+
     // Add Full Schedule to Calendar
     const addScheduleBtn = document.getElementById('add-schedule-btn');
     if (addScheduleBtn) {
@@ -214,37 +286,40 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 
     // Delete Logbook or User Entry Confirmation (for admin)
-    document.querySelectorAll('.delete-log-form').forEach(form => {
-        form.addEventListener('submit', function(event) {
-            event.preventDefault(); 
+    function bindDeleteForms(root) {
+        root.querySelectorAll('.delete-log-form').forEach(form => {
+            form.addEventListener('submit', function(event) {
+                event.preventDefault(); 
             
-            let itemTitle = '';
-            let confirmText = '';
+                let itemTitle = '';
+                let confirmText = '';
             
-            const logItem = this.closest('.log-content');
-            const userItemRow = this.closest('tr');
-
-            if (logItem) {
-                itemTitle = logItem.querySelector('h3').textContent;
-                confirmText = 'Are you sure you want to delete this logbook entry? All associated tasks will also be removed.';
-            } else if (userItemRow) {
-                itemTitle = userItemRow.querySelector('td:first-child').textContent;
-                confirmText = 'Are you sure you want to delete this user? All their diagnoses and tasks will be permanently removed.';
-            } else {
-                itemTitle = 'this item';
-                confirmText = 'Are you sure you want to delete this item?';
-            }
-
-            showConfirmModal(
-                'Confirm Deletion',
-                confirmText,
-                itemTitle,
-                () => {
-                    event.target.submit(); 
+                const logItem = this.closest('.log-content');
+                const userItemRow = this.closest('tr');
+
+                if (logItem) {
+                    itemTitle = logItem.querySelector('h3').textContent;
+                    confirmText = 'Are you sure you want to delete this logbook entry? All associated tasks will also be removed.';
+                } else if (userItemRow) {
+                    itemTitle = userItemRow.querySelector('td:first-child').textContent;
+                    confirmText = 'Are you sure you want to delete this user? All their diagnoses and tasks will be permanently removed.';
+                } else {
+                    itemTitle = 'this item';
+                    confirmText = 'Are you sure you want to delete this item?';
                 }
-            );
+
+                showConfirmModal(
+                    'Confirm Deletion',
+                    confirmText,
+                    itemTitle,
+                    () => {
+                        event.target.submit(); 
+                    }
+                );
+            });
         });
-    });
+    }
+    bindDeleteForms(document);
 
     // Admin & Report Modals
     // Edit User Modal
@@ -387,13 +462,51 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    document.querySelectorAll('.btn-report-inaccuracy').forEach(button => {
-        button.addEventListener('click', function() {
-            const diagnosisId = this.dataset.diagnosisId;
-            window.openReportModal(diagnosisId);
+    function bindReportButtons(root) {
+        root.querySelectorAll('.btn-report-inaccuracy').forEach(button => {
+            button.addEventListener('click', function() {
+                const diagnosisId = this.dataset.diagnosisId;
+                window.openReportModal(diagnosisId);
+            });
         });
-    });
+    }
+    bindReportButtons(document);
+
+
+    // Infinite Scroll (logbook entries & admin user list)
+    document.querySelectorAll('.infinite-scroll-sentinel').forEach(sentinel => {
+        const target = document.querySelector(sentinel.dataset.target);
+        let loading = false;
+
+        const observer = new IntersectionObserver(entries => {
+            if (!entries[0].isIntersecting || loading) return;
+            loading = true;
+
+            fetch(sentinel.dataset.nextUrl)
+                .then(response => response.json())
+                .then(data => {
+                    const page = document.createElement('template');
+                    page.innerHTML = data.html;
+                    bindDeleteForms(page.content);
+                    bindReportButtons(page.content);
+                    target.appendChild(page.content);
+
+                    if (data.next_url) {
+                        sentinel.dataset.nextUrl = data.next_url;
+                        // Re-observe so a sentinel that is still on screen loads the next page too
+                        observer.unobserve(sentinel);
+                        observer.observe(sentinel);
+                    } else {
+                        observer.disconnect();
+                        sentinel.remove();
+                    }
+                })
+                .catch(error => console.error('Error loading more items:', error))
+                .finally(() => { loading = false; });
+        }, { rootMargin: '400px' });
 
+        observer.observe(sentinel);
+    });
 
     // Admin Charts
     const pieChartCtx = document.getElementById('feedbackPieChart');
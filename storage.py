@@ -0,0 +1,140 @@
+import hashlib
+import io
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from PIL import Image
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif', 'BMP': '.bmp'}
+
+
+class UploadStore:
+    """Content-addressed image store under `static/<prefix>/` with Mongo reference counts.
+
+    Each distinct upload is written once as `<prefix>/<hh>/<sha256><ext>` next
+    to a small WebP thumbnail for list views, so paths never change meaning
+    and can be cached forever. The `blobs` collection holds one document per
+    hash with a `refs` count; `release()` removes the files only when the last
+    diagnosis pointing at them is deleted. While it does, the document is
+    marked `deleting` and `save()` of the same bytes waits for it to go.
+    """
+
+    # How long save() waits for a release() that is removing the same blob, and
+    # after how long a `deleting` mark is treated as left behind by a crash
+    DELETE_WAIT = 5
+    STALE_DELETE_AFTER = 60
+
+    def __init__(self, collection, static_root='static', prefix='uploads/blobs', thumbnail_size=(320, 320)):
+        self.collection = collection
+        self.static_root = static_root
+        self.prefix = prefix
+        self.thumbnail_size = thumbnail_size
+
+    def paths_for(self, image_hash, ext):
+        folder = f"{self.prefix}/{image_hash[:2]}"
+        return f"{folder}/{image_hash}{ext}", f"{folder}/{image_hash}-thumb.webp"
+
+    def is_stored_path(self, path):
+        return path.startswith(self.prefix + '/')
+
+    def save(self, data, image_hash=None):
+        """Stores `data` (if not already stored), takes a reference and returns the blob record.
+
+        Raises PIL.UnidentifiedImageError if the bytes are not an image.
+        """
+        image_hash = image_hash or hashlib.sha256(data).hexdigest()
+        deadline = time.monotonic() + self.DELETE_WAIT
+        blob = self._take_reference(data, image_hash)
+        while blob is None:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Stored upload {image_hash} is still being deleted")
+            time.sleep(0.05)
+            blob = self._take_reference(data, image_hash)
+
+        # Files are (re)written after the reference is taken: release() only removes
+        # them from a blob it has marked `deleting`, which this reference can't match
+        if not os.path.exists(self._disk_path(blob['image_path'])):
+            self._write(blob['image_path'], data)
+        if not os.path.exists(self._disk_path(blob['thumb_path'])):
+            self._write(blob['thumb_path'], self.make_thumbnail(data))
+        return blob
+
+    def _take_reference(self, data, image_hash):
+        """Increments (or creates) the blob's refs; returns None while release() is deleting it."""
+        live = {'_id': image_hash, 'deleting': {'$ne': True}}
+        blob = self.collection.find_one(live)
+        if blob is None:
+            with Image.open(io.BytesIO(data)) as img:
+                ext = EXTENSIONS.get(img.format, '.img')
+            image_path, thumb_path = self.paths_for(image_hash, ext)
+        else:
+            image_path, thumb_path = blob['image_path'], blob['thumb_path']
+
+        try:
+            return self.collection.find_one_and_update(
+                live,
+                {'$inc': {'refs': 1}, '$setOnInsert': {'image_path': image_path, 'thumb_path': thumb_path, 'size': len(data)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # The upsert hit a `deleting` document; clear it if a crash left it behind
+            self.collection.delete_one({'_id': image_hash, 'deleting': True,
+                                        'deleting_at': {'$lt': datetime.now() - timedelta(seconds=self.STALE_DELETE_AFTER)}})
+            return None
+
+    def release(self, image_hash):
+        """Drops one reference; deletes the blob and its files once nothing refers to it."""
+        blob = self.collection.find_one_and_update(
+            {'_id': image_hash, 'refs': {'$gt': 0}},
+            {'$inc': {'refs': -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not blob or blob['refs'] > 0:
+            return False
+        # Claim the deletion first: from here on save() can't take a reference to this blob
+        blob = self.collection.find_one_and_update(
+            {'_id': image_hash, 'refs': {'$lte': 0}, 'deleting': {'$ne': True}},
+            {'$set': {'deleting': True, 'deleting_at': datetime.now()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not blob:
+            return False
+        for path in (blob['image_path'], blob['thumb_path']):
+            try:
+                os.remove(self._disk_path(path))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Error deleting stored file {path}: {e}")
+        self.collection.delete_one({'_id': image_hash, 'deleting': True})
+        return True
+
+    def make_thumbnail(self, data):
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft('RGB', self.thumbnail_size)
+            img = img.convert('RGB')
+            img.thumbnail(self.thumbnail_size)
+            out = io.BytesIO()
+            img.save(out, 'WEBP', quality=75, method=4)
+        return out.getvalue()
+
+    def _disk_path(self, path):
+        return os.path.join(self.static_root, *path.split('/'))
+
+    def _write(self, path, data):
+        """Writes via a temp file + rename so readers never see a partial file."""
+        disk_path = self._disk_path(path)
+        os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(disk_path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, disk_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
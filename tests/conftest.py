@@ -0,0 +1,110 @@
+"""Shared fixtures: app.py imported against mongomock, with Gemini replaced by a local stub.
+
+Needs pytest and mongomock on top of requirements.txt; run `python -m pytest tests`.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# Tests are run from the repo root or from this folder; make the app modules importable either way.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+SUGGESTIONS_TEXT = """### Description
+A fungal disease that causes dark streaks on the leaves.
+
+### Treatment Plan
+1. Remove infected leaves.
+2. Apply a recommended fungicide.
+
+### Prevention
+- Keep good spacing between plants.
+
+### Generated Treatment Schedule
+| Date (Relative) | Task | Details |
+|---|---|---|
+| Today | Remove infected leaves | Cut and burn affected leaves |
+| Day 7 (Week 1) | Apply fungicide | Spray the underside of the leaves |
+"""
+
+
+class StubGeminiModel:
+    """Stands in for `genai.GenerativeModel`: answers every prompt with `text`, or raises `error`, and counts the calls."""
+
+    def __init__(self, text=SUGGESTIONS_TEXT, chunks=4):
+        self.text = text
+        self.chunks = chunks
+        self.error = None
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.error:
+            raise self.error
+        if not stream:
+            return SimpleNamespace(text=self.text)
+        size = max(1, len(self.text) // self.chunks)
+        return iter([SimpleNamespace(text=self.text[start:start + size]) for start in range(0, len(self.text), size)])
+
+
+def wait_for(condition, timeout=5):
+    """Polls `condition()` until it is true; fails the test after `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out waiting for a background thread")
+        time.sleep(0.01)
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    """Imports app.py once, on mongomock, without TensorFlow, index builds or the real Gemini API."""
+    import flask_pymongo
+    import mongomock
+    from flask import abort
+    flask_pymongo.MongoClient = mongomock.MongoClient
+
+    def find_one_or_404(collection, *args, **kwargs):
+        # What flask_pymongo adds to its own Collection class
+        document = collection.find_one(*args, **kwargs)
+        if document is None:
+            abort(404)
+        return document
+    mongomock.Collection.find_one_or_404 = find_one_or_404
+
+    # The prediction cache fingerprints the model file; the model itself is never loaded
+    model_file = tempfile.NamedTemporaryFile(suffix=".keras", delete=False)
+    model_file.close()
+    os.environ.update({
+        "MONGO_URI": "mongodb://localhost:27017/plant_care_test",
+        "GEMINI_API_KEY": "test",
+        "INFERENCE_MODEL_PATH": model_file.name,
+        "MODEL_SERVING": "shared",
+        "ENSURE_INDEXES": "0",
+        "BCRYPT_LOG_ROUNDS": "4",
+    })
+    import app
+    # Tests drive the diagnosis jobs themselves; no recovery or queue pollers on the first request
+    app.background_workers_started = True
+    yield app
+    os.unlink(model_file.name)
+
+
+@pytest.fixture
+def gemini(app_module, monkeypatch):
+    """A fresh stub model behind the app's LLM client, with a closed circuit and an empty suggestion cache."""
+    from llm import CircuitBreaker
+    stub = StubGeminiModel()
+    monkeypatch.setattr(app_module.llm, "model", stub)
+    monkeypatch.setattr(app_module.llm, "breaker", CircuitBreaker())
+    app_module.suggestion_cache.clear()
+    yield stub
+    app_module.suggestion_cache.clear()
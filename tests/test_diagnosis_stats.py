@@ -0,0 +1,113 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+
+@pytest.fixture
+def stats_app(app_module):
+    """Empty diagnoses/stats collections and a logged-in user and admin."""
+    for collection in (app_module.diagnoses_collection, app_module.stats_collection,
+                       app_module.users_collection, app_module.tasks_collection):
+        collection.delete_many({})
+    app_module.user_cache.clear()
+    user_id = app_module.users_collection.insert_one({"name": "Grower", "email": "grower@example.com", "role": "user"}).inserted_id
+    admin_id = app_module.users_collection.insert_one({"name": "Admin", "email": "admin@example.com", "role": "admin"}).inserted_id
+    return app_module, user_id, admin_id
+
+
+def logged_in_client(app_module, user_id):
+    client = app_module.app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    return client
+
+
+def add_diagnosis(app_module, user_id, disease_name, **flags):
+    return app_module.diagnoses_collection.insert_one({
+        "user_id": user_id, "disease_name": disease_name, "confidence": "90.00%",
+        "status": "complete", "timestamp": datetime.now(), **flags,
+    }).inserted_id
+
+
+def add_pending(app_module, user_id):
+    return add_diagnosis(app_module, user_id, app_module.PENDING_DISEASE_NAME, status="queued")
+
+
+def assert_consistent(app_module):
+    assert app_module.load_diagnosis_stats() == app_module.aggregate_diagnosis_stats()
+
+
+def test_incremental_stats_match_full_aggregation(stats_app):
+    app_module, user_id, admin_id = stats_app
+    client = logged_in_client(app_module, user_id)
+
+    # Diagnoses from before the stats document existed
+    history = [add_diagnosis(app_module, user_id, "Anthracnose", reported_as_inaccurate=True) for _ in range(3)]
+    add_diagnosis(app_module, user_id, "Leaf Banana Moko Disease", confirmed_accurate=True)
+
+    # A prediction landing before anyone reads the stats must not start the document from scratch
+    pending = add_pending(app_module, user_id)
+    assert app_module.record_prediction(pending, {"disease_name": "Leaf Banana Moko Disease", "status": "suggesting"})
+    assert app_module.stats_collection.count_documents({}) == 0
+    assert_consistent(app_module)
+
+    # Predictions, including a re-run job and feedback given while still pending
+    early_feedback = add_pending(app_module, user_id)
+    assert client.post(f"/api/confirm_diagnosis/{early_feedback}").status_code == 200
+    app_module.record_prediction(early_feedback, {"disease_name": "Anthracnose", "status": "suggesting"})
+    app_module.record_prediction(early_feedback, {"disease_name": "Anthracnose", "status": "suggesting"})
+    assert_consistent(app_module)
+
+    # Confirming, reporting and repeating either
+    assert client.post(f"/api/confirm_diagnosis/{history[0]}").status_code == 200
+    assert client.post(f"/api/confirm_diagnosis/{history[0]}").status_code == 200
+    assert client.post(f"/api/report_diagnosis/{pending}", json={"reason": "wrong leaf"}).status_code == 200
+    assert client.post(f"/api/report_diagnosis/{pending}", json={"reason": "still wrong"}).status_code == 200
+    assert client.post(f"/api/report_diagnosis/{early_feedback}", json={"reason": "changed my mind"}).status_code == 200
+    assert_consistent(app_module)
+
+    # Deleting, and a job finishing for a diagnosis deleted under it
+    assert client.post(f"/delete_diagnosis/{history[1]}").status_code == 302
+    deleted = add_pending(app_module, user_id)
+    assert client.post(f"/delete_diagnosis/{deleted}").status_code == 302
+    assert not app_module.record_prediction(deleted, {"disease_name": "Anthracnose", "status": "suggesting"})
+    assert_consistent(app_module)
+
+    result = app_module.app.test_cli_runner().invoke(args=["check-stats"])
+    assert result.exit_code == 0, result.output
+
+    chart = logged_in_client(app_module, admin_id).get("/api/admin/chart_data").get_json()
+    full = app_module.aggregate_diagnosis_stats()
+    assert chart["pieData"]["counts"] == [sum(c["confirmed"] for c in full.values()),
+                                          sum(c["reported"] for c in full.values())]
+
+
+def test_check_stats_reports_drift_and_rebuild_repairs_it(stats_app):
+    app_module, user_id, _ = stats_app
+    add_diagnosis(app_module, user_id, "Anthracnose", reported_as_inaccurate=True)
+    app_module.rebuild_diagnosis_stats()
+    app_module.stats_collection.update_one({"_id": app_module.DIAGNOSIS_STATS_ID},
+                                           {"$inc": {"diseases.Anthracnose.reported": 5}})
+
+    runner = app_module.app.test_cli_runner()
+    result = runner.invoke(args=["check-stats"])
+    assert result.exit_code == 1
+    assert "Anthracnose" in result.output
+
+    assert runner.invoke(args=["rebuild-stats"]).exit_code == 0
+    assert runner.invoke(args=["check-stats"]).exit_code == 0
+
+
+def test_admin_delete_user_removes_their_diagnoses_from_the_stats(stats_app):
+    app_module, user_id, admin_id = stats_app
+    other_id = app_module.users_collection.insert_one({"name": "Other", "email": "other@example.com", "role": "user"}).inserted_id
+    add_diagnosis(app_module, user_id, "Anthracnose", confirmed_accurate=True)
+    add_diagnosis(app_module, other_id, "Anthracnose", reported_as_inaccurate=True)
+    add_diagnosis(app_module, other_id, "Banana Split Peel")
+    app_module.rebuild_diagnosis_stats()
+
+    assert logged_in_client(app_module, admin_id).post(f"/admin/delete_user/{other_id}").status_code == 302
+    assert app_module.diagnoses_collection.count_documents({"user_id": ObjectId(other_id)}) == 0
+    assert_consistent(app_module)
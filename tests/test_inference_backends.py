@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+keras = pytest.importorskip("keras")
+pytest.importorskip("tensorflow")
+
+import inference  # noqa: E402
+
+IMAGES = 12
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    """A few-kilobyte Keras model with the production shapes, and uploads laid out like the blob store."""
+    root = tmp_path_factory.mktemp("inference")
+    keras.utils.set_random_seed(0)
+    inputs = keras.Input((*inference.IMAGE_SIZE, 3))
+    x = keras.layers.Rescaling(1 / 255)(inputs)
+    x = keras.layers.Conv2D(4, 3, strides=4, activation="relu")(x)
+    x = keras.layers.GlobalAveragePooling2D()(x)
+    keras.Model(inputs, keras.layers.Dense(len(inference.CLASS_NAMES))(x)).save(root / "model.keras")
+
+    rng = np.random.default_rng(0)
+    for i in range(IMAGES):
+        folder = root / "uploads" / "blobs" / f"{i:02x}"
+        folder.mkdir(parents=True)
+        pixels = rng.integers(0, 255, (300, 400, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(folder / f"{i:02x}{'0' * 62}.jpg", "JPEG")
+        Image.fromarray(pixels).resize((40, 30)).save(folder / f"{i:02x}{'0' * 62}-thumb.webp", "WEBP")
+    return root
+
+
+@pytest.mark.parametrize("quantize", ["dynamic", "int8"])
+def test_converted_tflite_model_matches_keras(model_dir, quantize):
+    keras_path = str(model_dir / "model.keras")
+    tflite_path = str(model_dir / f"model-{quantize}.tflite")
+    uploads = str(model_dir / "uploads")
+
+    inference.convert_model(keras_path, tflite_path, quantize, uploads)
+    result = inference.check_parity(inference.load_backend("keras", keras_path),
+                                    inference.load_backend("tflite", tflite_path), uploads)
+
+    assert result["images"] == IMAGES  # thumbnails are not counted
+    assert result["top1_agreement"] >= 0.98
+    assert result["max_prob_diff"] < 0.05
+
+
+def test_parity_command_exits_zero_on_agreement(model_dir):
+    keras_path = str(model_dir / "model.keras")
+    tflite_path = str(model_dir / "model-cli.tflite")
+    uploads = str(model_dir / "uploads")
+
+    assert inference.main(["convert", "--model", keras_path, "--output", tflite_path, "--quantize", "dynamic"]) == 0
+    assert os.path.getsize(tflite_path) > 0
+    assert inference.main(["parity", "--reference", keras_path, "--candidate", tflite_path,
+                           "--backend", "tflite", "--images", uploads]) == 0
+
+
+def test_parity_command_fails_without_images(model_dir, tmp_path):
+    keras_path = str(model_dir / "model.keras")
+    tflite_path = str(model_dir / "model-empty.tflite")
+    inference.convert_model(keras_path, tflite_path, "none", str(model_dir / "uploads"))
+
+    assert inference.main(["parity", "--reference", keras_path, "--candidate", tflite_path,
+                           "--backend", "tflite", "--images", str(tmp_path)]) == 1
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from conftest import StubGeminiModel
+from llm import CircuitBreaker, LLMClient, LLMUnavailableError
+
+
+def open_client(reset_timeout=0.05):
+    """A client whose breaker has just opened after one failed call."""
+    model = StubGeminiModel()
+    client = LLMClient(model, max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout))
+    model.error = TimeoutError("slow API")
+    with pytest.raises(TimeoutError):
+        client.generate("suggestions", "prompt")
+    model.error = None
+    return client, model
+
+
+def test_open_circuit_fails_fast():
+    client, model = open_client(reset_timeout=60)
+
+    with pytest.raises(LLMUnavailableError):
+        client.generate("suggestions", "prompt")
+    assert model.calls == 1
+
+
+def test_abandoned_stream_probe_closes_the_circuit():
+    client, _ = open_client()
+    time.sleep(0.06)
+
+    probe = client.stream("suggestions", "prompt")
+    next(probe)
+    assert client.breaker.state == "half_open"
+    probe.close()  # e.g. the browser went away mid-page
+
+    assert client.breaker.state == "closed"
+    assert client.generate("suggestions", "prompt")
+    assert client.snapshot()["in_flight"] == 0
+
+
+def test_half_open_probe_that_never_reports_back_expires():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+
+    assert breaker.allow()
+    assert not breaker.allow()  # one probe at a time
+    time.sleep(0.06)
+    assert breaker.allow()
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+from conftest import REPO_ROOT
+
+# A throwaway database on a local mongod; the audit creates the indexes there and nothing else
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI", "mongodb://localhost:27017/plant_care_query_plans")
+
+
+def mongod_available():
+    from pymongo import MongoClient
+    try:
+        MongoClient(MONGO_TEST_URI, serverSelectionTimeoutMS=1000).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+def test_plan_has_collscan_finds_nested_stages(app_module):
+    plan = {"queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}}
+    assert app_module.plan_has_collscan(plan)
+
+
+def test_plan_has_collscan_ignores_rejected_plans(app_module):
+    plan = {"queryPlanner": {
+        "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1_timestamp_-1"}},
+        "rejectedPlans": [{"stage": "COLLSCAN"}],
+    }}
+    assert not app_module.plan_has_collscan(plan)
+
+
+def test_plan_has_collscan_looks_inside_aggregation_stages(app_module):
+    plan = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}}, {"$group": {}}]}
+    assert app_module.plan_has_collscan(plan)
+
+
+@pytest.mark.skipif(not mongod_available(), reason=f"no mongod at {MONGO_TEST_URI}")
+def test_no_route_query_needs_a_collection_scan():
+    """Runs `flask audit-queries` (explain() on every audited query) against the local mongod."""
+    with tempfile.NamedTemporaryFile(suffix=".keras") as model_file:
+        env = {**os.environ, "MONGO_URI": MONGO_TEST_URI, "GEMINI_API_KEY": "test", "INFERENCE_MODEL_PATH": model_file.name,
+               "MODEL_SERVING": "shared", "ENSURE_INDEXES": "0"}
+        result = subprocess.run([sys.executable, "-m", "flask", "--app", "app", "audit-queries"],
+                                cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120)
+
+    assert "COLLSCAN" not in result.stdout, result.stdout
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "ok        dashboard: recent diagnoses" in result.stdout
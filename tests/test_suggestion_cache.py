@@ -0,0 +1,77 @@
+from cache import TieredCache
+from conftest import wait_for
+
+DISEASE = "Leaf Banana Black Sigatoka Disease"
+
+
+def test_miss_calls_gemini_once_then_hits(app_module, gemini):
+    first = app_module.get_smart_suggestions(DISEASE)
+    second = app_module.get_smart_suggestions(DISEASE)
+
+    assert gemini.calls == 1
+    assert second == first
+    assert first["description"] == "A fungal disease that causes dark streaks on the leaves."
+    assert first["schedule"] == [
+        {"date": "Today", "task": "Remove infected leaves", "details": "Cut and burn affected leaves"},
+        {"date": "Day 7 (Week 1)", "task": "Apply fungicide", "details": "Spray the underside of the leaves"},
+    ]
+
+
+def test_parsed_answer_is_shared_through_mongo(app_module, gemini):
+    suggestions = app_module.get_smart_suggestions(DISEASE)
+
+    # Another worker has its own memory tier but reads the same collection
+    other_worker = TieredCache(app_module.suggestion_cache_collection, version=app_module.SUGGESTION_PROMPT_VERSION)
+    assert other_worker.get(DISEASE) == suggestions
+
+
+def test_healthy_classes_skip_gemini(app_module, gemini):
+    suggestions = app_module.get_smart_suggestions("Healthy Banana")
+
+    assert suggestions["description"] == "This plant appears to be healthy."
+    assert gemini.calls == 0
+
+
+def test_error_fallback_is_never_cached(app_module, gemini):
+    gemini.error = ValueError("prompt blocked")
+    assert app_module.get_smart_suggestions(DISEASE)["description"] == "Error fetching details."
+    assert app_module.suggestion_cache_collection.count_documents({}) == 0
+
+    gemini.error = None
+    assert app_module.get_smart_suggestions(DISEASE)["description"] != "Error fetching details."
+    assert gemini.calls == 2
+
+
+def test_stale_entry_is_served_and_refreshed_in_background(app_module, gemini, monkeypatch):
+    original = app_module.get_smart_suggestions(DISEASE)
+    monkeypatch.setattr(app_module.suggestion_cache, "refresh_after", 0)
+    gemini.text = gemini.text.replace("dark streaks", "yellow streaks")
+
+    assert app_module.get_smart_suggestions(DISEASE) == original
+    wait_for(lambda: "yellow" in app_module.suggestion_cache.get(DISEASE)["description"])
+    assert gemini.calls == 2
+
+
+def test_failed_refresh_keeps_the_cached_answer(app_module, gemini, monkeypatch):
+    original = app_module.get_smart_suggestions(DISEASE)
+    monkeypatch.setattr(app_module.suggestion_cache, "refresh_after", 0)
+    gemini.error = ValueError("prompt blocked")
+
+    assert app_module.get_smart_suggestions(DISEASE) == original
+    wait_for(lambda: gemini.calls == 2 and not app_module.suggestion_cache._refreshing)
+    assert app_module.suggestion_cache.get(DISEASE) == original
+
+
+def test_background_refresh_never_calls_the_requests_on_partial(app_module, gemini, monkeypatch):
+    first_partials = []
+    app_module.get_smart_suggestions(DISEASE, on_partial=first_partials.append)
+    assert first_partials
+
+    monkeypatch.setattr(app_module.suggestion_cache, "refresh_after", 0)
+    gemini.text = gemini.text.replace("dark streaks", "yellow streaks")
+    late_partials = []
+    app_module.get_smart_suggestions(DISEASE, on_partial=late_partials.append)
+    wait_for(lambda: "yellow" in app_module.suggestion_cache.get(DISEASE)["description"])
+
+    # The refresh runs after the request has finished; its partials must not reach that request's diagnosis
+    assert late_partials == []